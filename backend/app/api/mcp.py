@@ -1,11 +1,11 @@
 from fastapi import APIRouter, HTTPException, Body
 from pydantic import BaseModel, ValidationError, field_validator, model_validator
 from typing import Dict, Any, Optional, List
-import json
 import os
 import re
 import time
 import httpx
+import orjson
 from app.core.mcp_client import McpManager
 from app.core.bot_pool import bot_pool
 from app.core.mcp_config import (
@@ -161,7 +161,7 @@ def get_marketplace_sources():
 async def import_marketplace(payload: Any = Body(...)):
     if isinstance(payload, (str, bytes, bytearray)):
         try:
-            payload = json.loads(payload)
+            payload = orjson.loads(payload)
         except Exception:
             raise HTTPException(status_code=422, detail="Invalid JSON body")
     try:
@@ -227,7 +227,7 @@ def get_servers():
 async def save_server(payload: Any = Body(...)):
     if isinstance(payload, (str, bytes, bytearray)):
         try:
-            payload = json.loads(payload)
+            payload = orjson.loads(payload)
         except Exception:
             raise HTTPException(status_code=422, detail="Invalid JSON body")
     try:
@@ -272,7 +272,7 @@ async def delete_server(server_id: str):
 async def test_connection(payload: Any = Body(...)):
     if isinstance(payload, (str, bytes, bytearray)):
         try:
-            payload = json.loads(payload)
+            payload = orjson.loads(payload)
         except Exception:
             raise HTTPException(status_code=422, detail="Invalid JSON body")
     try:
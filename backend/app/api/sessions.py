@@ -10,7 +10,15 @@ from pydantic import BaseModel
 from sqlalchemy import desc
 
 import app.core.filesystem as session_fs
-from app.core.persistence import ChatMessage, SessionRecord, ToolCall, db_session, load_chat_messages_page
+from app.core.persistence import (
+    ChatMessage,
+    SessionRecord,
+    ToolCall,
+    db_session,
+    forget_session,
+    load_chat_messages_page,
+    run_persistence,
+)
 
 
 router = APIRouter(prefix="/api/sessions", tags=["sessions"])
@@ -172,6 +180,7 @@ def delete_session(session_id: str, purge: bool = False):
                 db.query(ChatMessage).filter(ChatMessage.session_id == sid).delete(synchronize_session=False)
                 db.query(ToolCall).filter(ToolCall.session_id == sid).delete(synchronize_session=False)
                 db.query(SessionRecord).filter(SessionRecord.id == sid).delete(synchronize_session=False)
+            forget_session(sid)
             if ws_dir:
                 try:
                     import shutil
@@ -229,7 +238,7 @@ def run_session_maintenance():
 async def get_session_messages(session_id: str, limit: int = 50, before_id: int | None = None):
     sid = _validate_session_id(session_id)
     try:
-        return load_chat_messages_page(session_id=sid, limit=limit, before_id=before_id)
+        return await run_persistence(load_chat_messages_page, session_id=sid, limit=limit, before_id=before_id)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Database error while loading session messages: {str(e)}")
 
@@ -238,7 +247,7 @@ async def get_session_messages(session_id: str, limit: int = 50, before_id: int
 async def autotitle_session(session_id: str):
     sid = _validate_session_id(session_id)
     try:
-        page = load_chat_messages_page(session_id=sid, limit=20, before_id=None)
+        page = await run_persistence(load_chat_messages_page, session_id=sid, limit=20, before_id=None)
         seed = "\n".join([f"{m['role']}: {m['content']}" for m in page.get("items", []) if m.get("content")])[:2000]
         title = await _generate_title_with_gemini(seed)
         if not title:
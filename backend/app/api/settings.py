@@ -1,5 +1,5 @@
 from typing import Any
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 
 from app.core.config_manager import (
@@ -11,6 +11,7 @@ from app.core.config_manager import (
     set_session_model,
     update_settings,
 )
+from app.core.google_auth import invalidate_workspace_config
 from app.core.models import get_available_gemini_models
 
 
@@ -43,8 +44,8 @@ class SessionSettingsRequest(BaseModel):
 
 
 @router.get("/api/available-models")
-async def list_models():
-    models = await get_available_gemini_models()
+async def list_models(limit: int | None = Query(default=None, ge=1)):
+    models = await get_available_gemini_models(limit=limit)
     return {"models": models}
 
 
@@ -75,6 +76,7 @@ def put_app_settings(payload: UpdateSettingsRequest):
         updated = update_settings(payload.model_dump(exclude_unset=True))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    invalidate_workspace_config()
     return {
         "settings": {
             "current_model": updated.current_model,
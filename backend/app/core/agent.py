@@ -14,7 +14,7 @@ from app.core.serialization import content_to_dict, dict_to_content
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.tools import StructuredTool
 
-from app.core.persistence import load_chat_history, save_chat_message
+from app.core.persistence import load_chat_history, run_persistence, save_chat_message
 from app.core.persistence_wrapper import wrap_tool
 from app.core.mcp_client import McpManager
 from app.core.agent_graph import AgentGraph
@@ -312,7 +312,7 @@ class NaviBot:
         session_id = get_session_id()
         
         # 1. Load History
-        history = load_chat_history(session_id)
+        history = await run_persistence(load_chat_history, session_id)
         
         # 2. Convert History
         lc_messages = self._history_to_lc_messages(history)
@@ -558,7 +558,7 @@ class NaviBot:
         from google.genai import types
 
         if history is None:
-            history = load_chat_history(session_id)
+            history = await run_persistence(load_chat_history, session_id)
         
         # Tools config
         tool_config = None
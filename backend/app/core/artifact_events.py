@@ -20,9 +20,10 @@ class ArtifactEventHub:
             return
 
     def publish(self, session_id: str, event_type: str, data: dict[str, Any]) -> None:
-        queues = list(self._subscribers.get(session_id, []))
-        if not queues:
+        subscribers = self._subscribers.get(session_id)
+        if not subscribers:
             return
+        queues = list(subscribers)
         payload = {"event": event_type, "data": data}
         for q in queues:
             try:
@@ -5,6 +5,7 @@ import json
 from http.server import BaseHTTPRequestHandler, HTTPServer
 import threading
 import socket
+import time
 
 try:
     from googleapiclient.discovery import build
@@ -49,13 +50,30 @@ def ensure_oauth_dependencies():
     if not OAUTH_AVAILABLE:
         raise ImportError("The 'google-auth-oauthlib' library is required but not installed.")
 
+_WORKSPACE_CONFIG_TTL_SECONDS = 30.0
+_cached_workspace_config: Optional[dict] = None
+_cached_workspace_config_at: float = 0.0
+
 def get_workspace_config():
-    """Retrieves Google Workspace configuration from settings."""
+    """Retrieves Google Workspace configuration from settings (cached for a short TTL)."""
+    global _cached_workspace_config, _cached_workspace_config_at
+    now = time.monotonic()
+    if _cached_workspace_config is not None and (now - _cached_workspace_config_at) < _WORKSPACE_CONFIG_TTL_SECONDS:
+        return _cached_workspace_config
     try:
         settings = get_settings()
-        return settings.google_workspace_config or {}
+        config = settings.google_workspace_config or {}
     except Exception:
         return {}
+    _cached_workspace_config = config
+    _cached_workspace_config_at = now
+    return config
+
+def invalidate_workspace_config() -> None:
+    """Drops the cached workspace config so the next call re-reads settings."""
+    global _cached_workspace_config, _cached_workspace_config_at
+    _cached_workspace_config = None
+    _cached_workspace_config_at = 0.0
 
 def _save_oauth_token(creds: UserCredentials) -> None:
     """Saves OAuth credentials to token file."""
@@ -66,7 +84,41 @@ def _save_oauth_token(creds: UserCredentials) -> None:
 # Global variable to hold the server instance so we can stop it if needed
 _oauth_server = None
 
+def _build_http_response(status: int, reason: str, body: bytes = b"", content_type: str = "text/plain; charset=utf-8") -> bytes:
+    """Builds a complete HTTP/1.0 response (status line, headers and body) as bytes."""
+    head = (
+        f"HTTP/1.0 {status} {reason}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n"
+        "\r\n"
+    )
+    return head.encode("latin-1") + body
+
+_SUCCESS_BODY = b"""
+    <html>
+    <head><title>Autenticacion Exitosa</title></head>
+    <body style="font-family: sans-serif; text-align: center; padding: 50px;">
+        <h1 style="color: green;">Autenticacion Exitosa</h1>
+        <p>NaviBot ha recibido tus credenciales.</p>
+        <p>Puedes cerrar esta ventana y volver al chat.</p>
+        <script>setTimeout(function(){ window.close(); }, 3000);</script>
+    </body>
+    </html>
+"""
+
+# Pre-built responses so each callback is answered with a single write
+_SUCCESS_RESPONSE = _build_http_response(200, "OK", _SUCCESS_BODY, "text/html; charset=utf-8")
+_BAD_REQUEST_RESPONSE = _build_http_response(400, "Bad Request", b"No code found in request")
+_NOT_FOUND_RESPONSE = _build_http_response(404, "Not Found")
+_SERVER_ERROR_RESPONSE = _build_http_response(500, "Internal Server Error")
+
 class OAuthCallbackHandler(BaseHTTPRequestHandler):
+    def _write_response(self, code: int, payload: bytes) -> None:
+        """Sends a pre-built response in one write (wfile is unbuffered, so this is a sendall)."""
+        self.log_request(code)
+        self.wfile.write(payload)
+
     def do_GET(self):
         try:
             if "code=" in self.path:
@@ -82,38 +134,26 @@ class OAuthCallbackHandler(BaseHTTPRequestHandler):
                     # Save credentials
                     try:
                         save_credentials_from_code(code)
-                        self.send_response(200)
-                        self.send_header("Content-type", "text/html")
-                        self.end_headers()
-                        self.wfile.write(b"""
-                            <html>
-                            <head><title>Autenticacion Exitosa</title></head>
-                            <body style="font-family: sans-serif; text-align: center; padding: 50px;">
-                                <h1 style="color: green;">Autenticacion Exitosa</h1>
-                                <p>NaviBot ha recibido tus credenciales.</p>
-                                <p>Puedes cerrar esta ventana y volver al chat.</p>
-                                <script>setTimeout(function(){ window.close(); }, 3000);</script>
-                            </body>
-                            </html>
-                        """)
+                        self._write_response(200, _SUCCESS_RESPONSE)
                     except Exception as e:
                         logger.error(f"Error saving credentials in callback: {e}")
-                        self.send_response(500)
-                        self.end_headers()
-                        self.wfile.write(f"Error saving credentials: {str(e)}".encode())
+                        self._write_response(
+                            500,
+                            _build_http_response(
+                                500,
+                                "Internal Server Error",
+                                f"Error saving credentials: {str(e)}".encode(),
+                            ),
+                        )
                 else:
-                    self.send_response(400)
-                    self.end_headers()
-                    self.wfile.write(b"No code found in request")
+                    self._write_response(400, _BAD_REQUEST_RESPONSE)
             else:
-                self.send_response(404)
-                self.end_headers()
+                self._write_response(404, _NOT_FOUND_RESPONSE)
         except Exception as e:
             logger.error(f"Error in OAuth handler: {e}")
             # Try to send error response if possible
             try:
-                self.send_response(500)
-                self.end_headers()
+                self._write_response(500, _SERVER_ERROR_RESPONSE)
             except:
                 pass
 
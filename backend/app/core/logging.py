@@ -8,6 +8,7 @@ from logging.handlers import RotatingFileHandler
 from typing import Any
 
 import httpx
+import orjson
 
 from app.core.runtime_context import get_request_id, get_session_id
 
@@ -16,9 +17,17 @@ def _utc_iso() -> str:
     return datetime.now(tz=timezone.utc).isoformat()
 
 
+def _dumps(value: Any) -> str:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+def _probe_json(value: Any) -> None:
+    orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
 def _safe_json(value: Any) -> Any:
     try:
-        json.dumps(value)
+        _probe_json(value)
         return value
     except Exception:
         return str(value)
@@ -64,7 +73,7 @@ class JsonFormatter(logging.Formatter):
             payload["payload"] = _safe_json(_redact(record.payload))
         if record.exc_info:
             payload["exception"] = _redact_text(self.formatException(record.exc_info))
-        return json.dumps(payload, ensure_ascii=False)
+        return _dumps(payload)
 
 
 class HttpLogHandler(logging.Handler):
@@ -130,4 +139,8 @@ async def notify_alert(event: dict) -> None:
         "event": _redact(event),
     }
     async with httpx.AsyncClient(timeout=4.0) as client:
-        await client.post(url, json=payload)
+        await client.post(
+            url,
+            content=_dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
@@ -1,7 +1,13 @@
 import asyncio
+import functools
+from dataclasses import dataclass
+import logging
 import os
+import time
 from typing import List, Dict, Any, Optional
 
+import orjson
+
 from app.core.mcp_config import get_active_config_runtime, get_registry_merged
 
 try:
@@ -13,15 +19,175 @@ except ImportError:
     StdioServerParameters = Any
     stdio_client = None
 
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=256)
+def _format_mask(def_args: tuple) -> tuple:
+    """Marca qué argumentos de una definición contienen placeholders ({path}, ...)."""
+    return tuple("{" in arg and "}" in arg for arg in def_args)
+
+
+def _materialize_args(def_args: List[str], params: Dict[str, Any]) -> List[str]:
+    """Sustituye los placeholders de los args. Lanza KeyError si falta un parámetro."""
+    def_args = tuple(def_args)
+    return [
+        arg.format_map(params) if needs_format else arg
+        for arg, needs_format in zip(def_args, _format_mask(def_args))
+    ]
+
+
+_HTTP_PREFIXES = ("http://", "https://")
+
+
+@functools.lru_cache(maxsize=256)
+def _url_env_names(env_vars: tuple) -> frozenset:
+    """Variables de una definición que contienen URLs base (*_BASE_URL)."""
+    return frozenset(name for name in env_vars if name.endswith("_BASE_URL"))
+
+
+def _resolve_env_overrides(definition: dict, settings: dict) -> tuple:
+    """
+    Calcula las variables de entorno que la definición requiere.
+
+    Devuelve (overrides, missing). Los valores de settings (modal de la UI) tienen
+    prioridad sobre os.environ; los *_BASE_URL sin esquema se normalizan a https.
+    """
+    overrides: Dict[str, str] = {}
+    missing = []
+    configured = settings.get('env_vars', {})
+    env_vars = tuple(definition.get('env_vars', []) or [])
+    url_envs = _url_env_names(env_vars)
+    for env_var in env_vars:
+        val = configured.get(env_var) or os.environ.get(env_var)
+        if env_var in url_envs and isinstance(val, str) and not val.startswith(_HTTP_PREFIXES):
+            val = f"https://{val.strip()}"
+        if val:
+            overrides[env_var] = val
+        else:
+            missing.append(env_var)
+    return overrides, missing
+
+
+def _config_hash(config: dict, registry: dict) -> int:
+    """Hash del contenido de (config, registry), independiente del orden de claves."""
+    raw = orjson.dumps([config, registry], option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return hash(raw)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    """Resuelve un futuro de señalización si aún está pendiente."""
+    if not future.done():
+        future.set_result(None)
+
+
+def _freeze(value: Any) -> Any:
+    """Convierte dicts/listas anidados en tuplas para poder usarlos como clave."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+# (server_id, settings, definition) congelados -> StdioServerParameters ya construidos.
+# Compartido entre instancias: la API crea un McpManager nuevo por cada test_connection.
+_PARAMS_CACHE: Dict[tuple, Any] = {}
+_PARAMS_CACHE_MAX = 64
+
+# Sesiones de "Test Connection" que se mantienen vivas unos segundos tras un éxito,
+# para que los reintentos desde la UI no vuelvan a lanzar el proceso STDIO.
+# (server_id, id(params)) -> [session, params, stop_event, task, last_used]
+_TEST_POOL: Dict[tuple, list] = {}
+_TEST_POOL_TTL = 30.0
+_TEST_POOL_TASKS: set = set()  # referencias fuertes a las tareas en curso
+
+
+async def close_test_sessions(timeout: float = 2.0) -> None:
+    """
+    Cierra todas las sesiones de "Test Connection" del pool y espera sus tareas.
+    No forma parte de McpManager.cleanup(): la API crea y limpia un manager por
+    cada prueba, y el pool debe sobrevivir a esas instancias.
+    """
+    for entry in list(_TEST_POOL.values()):
+        entry[2].set()
+    _TEST_POOL.clear()
+    tasks = list(_TEST_POOL_TASKS)
+    if not tasks:
+        return
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Timed out waiting for MCP test sessions to close")
+
+
+@dataclass(slots=True, frozen=True)
+class ToolDef:
+    """Definición de una herramienta MCP con nombre prefijado por servidor."""
+    name: str
+    description: str
+    input_schema: Any
+    session: Any  # Guardamos ref para saber a quién llamar
+    original_name: str
+
+    # Claves del antiguo formato dict -> atributo, para los llamadores que usan tool_def["..."]
+    _KEYS = {
+        "name": "name",
+        "description": "description",
+        "inputSchema": "input_schema",
+        "origin_session": "session",
+        "original_name": "original_name",
+    }
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, self._KEYS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        attr = self._KEYS.get(key)
+        return getattr(self, attr) if attr is not None else default
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, attr) for key, attr in self._KEYS.items()}
+
+
 class McpManager:
+    __slots__ = (
+        "active_sessions",
+        "tools_cache",
+        "tool_lookup",
+        "tool_definitions",
+        "_required_args",
+        "_server_tasks",
+        "_stop_futures",
+        "_tools_cache",
+        "_tools_ttl",
+        "_tools_locks",
+        "_tools_dirty",
+        "_connect_timeout",
+        "_last_sync_hash",
+    )
+
     def __init__(self):
         self.active_sessions: Dict[str, ClientSession] = {} 
         self.tools_cache = [] 
         self.tool_lookup: Dict[str, tuple] = {} # prefixed_name -> (server_id, original_name) 
-        self.tool_definitions: Dict[str, Dict[str, Any]] = {}
+        self.tool_definitions: Dict[str, ToolDef] = {}
+        self._required_args: Dict[str, tuple] = {}  # prefixed_name -> required arg names
         
         self._server_tasks: Dict[str, asyncio.Task] = {}
-        self._shutdown_events: Dict[str, asyncio.Event] = {}
+        self._stop_futures: Dict[str, asyncio.Future] = {}  # resolved to request shutdown
+
+        # server_id -> (monotonic timestamp, tools) from the last list_tools()
+        self._tools_cache: Dict[str, tuple] = {}
+        self._tools_ttl = 30.0
+        self._tools_locks: Dict[str, asyncio.Lock] = {}
+        # True cuando tool_lookup/tool_definitions deben reconstruirse
+        self._tools_dirty = True
+        self._connect_timeout = 10.0
+        # Estado de la última sincronización completa, para saltarla si nada cambió
+        self._last_sync_hash: Optional[int] = None
 
     async def load_servers(self): 
         """Carga la configuración de MCP desde la base de datos e inicia los servidores.""" 
@@ -33,177 +199,282 @@ class McpManager:
             config = get_active_config_runtime()
             registry = get_registry_merged()
             servers = config.get("servers", {})
+
+            # Misma config y todos los servidores habilitados (y solo ellos) con sesión viva:
+            # nada que hacer. Un servidor que falló al conectar no tiene sesión, así que
+            # se reintenta en cada pasada.
+            sync_hash = _config_hash(config, registry)
+            if sync_hash == self._last_sync_hash:
+                enabled = {server_id for server_id, settings in servers.items() if settings.get('enabled')}
+                if enabled == self.active_sessions.keys():
+                    return
             
             # 1. Detener servidores que ya no están habilitados o configurados
-            active_ids = list(self.active_sessions.keys())
-            for server_id in active_ids:
-                if server_id not in servers or not servers[server_id].get('enabled'):
-                    await self.stop_server(server_id)
+            for server_id in list(self._tools_cache.keys()):
+                if server_id not in servers:
+                    self._invalidate_tools(server_id)
+            to_stop = [
+                server_id for server_id in self.active_sessions
+                if server_id not in servers or not servers[server_id].get('enabled')
+            ]
+            if to_stop:
+                await asyncio.gather(
+                    *(self.stop_server(server_id) for server_id in to_stop),
+                    return_exceptions=True,
+                )
             
-            # 2. Iniciar servidores habilitados que no están corriendo
-            for server_id, settings in servers.items(): 
-                if settings.get('enabled'): 
-                    # TODO: Detectar cambios de config para reiniciar?
-                    if server_id not in self.active_sessions:
-                        await self.connect_server(server_id, settings, registry)
+            # 2. Iniciar servidores habilitados que no están corriendo (en paralelo)
+            # TODO: Detectar cambios de config para reiniciar?
+            to_start = [
+                (server_id, settings) for server_id, settings in servers.items()
+                if settings.get('enabled') and server_id not in self.active_sessions
+            ]
+            if to_start:
+                results = await asyncio.gather(
+                    *(
+                        self.connect_server(server_id, settings, registry, timeout=self._connect_timeout)
+                        for server_id, settings in to_start
+                    ),
+                    return_exceptions=True,
+                )
+                for (server_id, _), result in zip(to_start, results):
+                    if isinstance(result, asyncio.TimeoutError):
+                        logger.warning("Timeout connecting MCP server %s", server_id)
+                    elif isinstance(result, Exception):
+                        logger.error("Error connecting MCP server %s: %s", server_id, result)
+
+            self._last_sync_hash = sync_hash
         except Exception as e:
-            print(f"Error syncing MCP servers: {e}")
+            logger.error("Error syncing MCP servers: %s", e)
+
+    def _invalidate_tools(self, server_id: str) -> None:
+        """Descarta la lista de herramientas cacheada de un servidor."""
+        if self._tools_cache.pop(server_id, None) is not None:
+            self._tools_dirty = True
 
     async def stop_server(self, server_id: str):
         """Detiene un servidor MCP específico."""
-        if server_id in self._shutdown_events:
-            self._shutdown_events[server_id].set()
+        self._invalidate_tools(server_id)
+        self._tools_dirty = True
+        stop = self._stop_futures.pop(server_id, None)
+        if stop is not None:
+            _resolve(stop)
             # Esperar a que termine la tarea
-            if server_id in self._server_tasks:
+            task = self._server_tasks.pop(server_id, None)
+            if task is not None:
                 try:
-                    await asyncio.wait_for(self._server_tasks[server_id], timeout=2.0)
+                    await asyncio.wait_for(task, timeout=2.0)
                 except (asyncio.TimeoutError, asyncio.CancelledError):
                     pass
-            
-            # Limpieza adicional si es necesario
-            if server_id in self.active_sessions:
-                del self.active_sessions[server_id]
-            if server_id in self._shutdown_events:
-                del self._shutdown_events[server_id]
-            if server_id in self._server_tasks:
-                del self._server_tasks[server_id]
-            
-            print(f"🛑 MCP Server detenido: {server_id}")
+            self.active_sessions.pop(server_id, None)
+            logger.info("MCP Server detenido: %s", server_id)
 
-    async def _run_server_task(self, name: str, params: StdioServerParameters, ready_event: asyncio.Event):
+    async def _run_server_task(self, name: str, params: StdioServerParameters, ready: asyncio.Future, stop: asyncio.Future):
         """Runs the MCP client session in a dedicated task."""
+        session = None
         try:
             async with stdio_client(params) as (read, write):
                 async with ClientSession(read, write) as session:
                     await session.initialize()
                     self.active_sessions[name] = session
-                    ready_event.set()
+                    _resolve(ready)
                     
                     # Keep session alive until shutdown is requested
-                    await self._shutdown_events[name].wait()
+                    await stop
         except Exception as e:
-            print(f"MCP Server {name} connection failed/closed: {e}")
+            logger.warning("MCP Server %s connection failed/closed: %s", name, e)
         except BaseException:
             # Catch BaseExceptionGroup and GeneratorExit during shutdown
             # The 'RuntimeError: Attempted to exit cancel scope...' from anyio often appears here
             # when mixing asyncio.create_task with anyio context managers.
             pass
         finally:
-            if not ready_event.is_set():
-                ready_event.set() # Unblock waiter if failed early
-            if name in self.active_sessions:
-                del self.active_sessions[name]
+            _resolve(ready) # Unblock waiter if failed early
+            # An abandoned attempt must not drop the session of a later reconnect
+            if session is not None and self.active_sessions.get(name) is session:
+                self.active_sessions.pop(name, None)
+                self._invalidate_tools(name)
+
+    def _prepare_server_params(self, server_id: str, settings: dict, registry: dict) -> tuple:
+        """
+        Resuelve comando, argumentos y entorno de un servidor MCP.
 
-    async def connect_server(self, server_id: str, settings: dict, registry: dict): 
-        # 1. Resolver el comando desde el Registry 
+        Devuelve (StdioServerParameters, None) o (None, mensaje de error). El resultado
+        se cachea por contenido de settings y definición, así que los reintentos de
+        "Test Connection" y los sync_servers repetidos no reconstruyen el entorno.
+        """
+        # 1. Resolver el comando desde el Registry
         definition = registry.get(server_id) or {}
-        
-        if not definition: 
+        if not definition:
+            # Si no está en registry, ¿tal vez es una config custom completa?
             if 'command' in settings:
                 definition = settings
             else:
-                print(f"Warning: Server definition for {server_id} not found in registry")
-                return 
+                return None, f"Server definition for {server_id} not found in registry"
 
-        # 2. Preparar argumentos y variables de entorno 
-        cmd = definition['command'] 
-        args = []
-        for arg in definition.get('args', []):
-            # Replace placeholders like {path} or {connection_string}
-            formatted_arg = arg
-            params = settings.get('params', {})
-            try:
-                # Check if arg has formatting placeholders
-                if "{" in arg and "}" in arg:
-                    formatted_arg = arg.format(**params)
-            except KeyError as e:
-                print(f"Missing param {e} for server {server_id}")
-                return
-            args.append(formatted_arg)
-            
-        env = os.environ.copy() 
-        if 'env_vars' in definition: 
-            missing_envs = []
-            for env_var in definition['env_vars']:
-                # Allow overriding via settings, or fallback to os.environ, or fail?
-                # Usually env vars like TOKENS are in os.environ or settings (if secure).
-                # The user plan implies they might be passed via settings/modal?
-                # "Usuario ingresa el token y da Guardar -> active_mcp.json"
-                # So we check settings['env_vars'] first, then os.environ
-                val = settings.get('env_vars', {}).get(env_var) or os.environ.get(env_var)
-                if isinstance(val, str) and env_var.endswith("_BASE_URL") and not val.startswith(("http://", "https://")):
-                    val = f"https://{val.strip()}"
-                if val:
-                    env[env_var] = val
-                else:
-                    missing_envs.append(env_var)
-            if missing_envs:
-                print(f"Missing env vars for {server_id}: {', '.join(missing_envs)}")
-                return
-
-        # 3. Iniciar conexión STDIO 
         if stdio_client is None:
-            print("MCP library not installed.")
-            return
+            return None, "MCP library not installed."
+
+        try:
+            # Incluye los valores de os.environ que pueden usarse como fallback
+            inherited = tuple(os.environ.get(name) for name in definition.get('env_vars', []) or [])
+            cache_key = (server_id, _freeze(settings), _freeze(definition), inherited)
+            hash(cache_key)
+        except TypeError:
+            cache_key = None
+        if cache_key is not None:
+            cached = _PARAMS_CACHE.get(cache_key)
+            if cached is not None:
+                return cached, None
+
+        # 2. Preparar argumentos y variables de entorno
+        cmd = definition['command']
+        try:
+            # Replace placeholders like {path} or {connection_string}
+            args = _materialize_args(definition.get('args', []), settings.get('params', {}))
+        except KeyError as e:
+            return None, f"Missing param {e} for server {server_id}"
+
+        overrides, missing_envs = _resolve_env_overrides(definition, settings)
+        if missing_envs:
+            return None, f"Faltan env vars para {server_id}: {', '.join(missing_envs)}"
 
-        server_params = StdioServerParameters(command=cmd, args=args, env=env) 
+        # Un único merge en C en lugar de copy() + un setitem por variable
+        server_params = StdioServerParameters(command=cmd, args=args, env={**os.environ, **overrides})
+        if cache_key is not None:
+            if len(_PARAMS_CACHE) >= _PARAMS_CACHE_MAX:
+                _PARAMS_CACHE.clear()
+            _PARAMS_CACHE[cache_key] = server_params
+        return server_params, None
+
+    async def connect_server(self, server_id: str, settings: dict, registry: dict, timeout: Optional[float] = None):
+        server_params, error = self._prepare_server_params(server_id, settings, registry)
+        if server_params is None:
+            logger.warning("%s", error)
+            return
         
         # Prepare synchronization primitives
-        shutdown_event = asyncio.Event()
-        self._shutdown_events[server_id] = shutdown_event
-        ready_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        self._stop_futures[server_id] = stop
+        ready = loop.create_future()
         
         # Start background task
-        task = asyncio.create_task(self._run_server_task(server_id, server_params, ready_event))
+        task = asyncio.create_task(self._run_server_task(server_id, server_params, ready, stop))
         self._server_tasks[server_id] = task
         
         # Wait for connection to be established
-        await ready_event.wait()
+        try:
+            await asyncio.wait_for(asyncio.shield(ready), timeout=timeout)
+        except asyncio.TimeoutError:
+            # Tear the attempt down: a live task would be overwritten by the next sync
+            # and its stdio process could no longer be stopped
+            if self._stop_futures.get(server_id) is stop:
+                del self._stop_futures[server_id]
+            if self._server_tasks.get(server_id) is task:
+                del self._server_tasks[server_id]
+            _resolve(stop)
+            task.cancel()
+            await asyncio.wait((task,), timeout=2.0)
+            raise
         
+        self._tools_dirty = True
         if server_id in self.active_sessions:
-            print(f"✅ MCP Server conectado: {server_id}")
+            logger.info("MCP Server conectado: %s", server_id)
         else:
-            print(f"❌ Falló conexión con {server_id}")
+            logger.error("Falló conexión con %s", server_id)
+
+    def _tools_fresh(self, sessions: list) -> bool:
+        """True si todos los servidores activos tienen una lista de herramientas vigente."""
+        now = time.monotonic()
+        for name, _ in sessions:
+            cached = self._tools_cache.get(name)
+            if cached is None or now - cached[0] >= self._tools_ttl:
+                return False
+        return True
+
+    async def _list_tools_cached(self, name: str, session: ClientSession) -> list:
+        """Devuelve las herramientas de un servidor, consultándolo solo si la caché expiró."""
+        cached = self._tools_cache.get(name)
+        if cached is not None and time.monotonic() - cached[0] < self._tools_ttl:
+            return cached[1]
+        lock = self._tools_locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            # Otro llamador pudo refrescar la entrada mientras esperábamos el lock
+            cached = self._tools_cache.get(name)
+            if cached is not None and time.monotonic() - cached[0] < self._tools_ttl:
+                return cached[1]
+            result = await session.list_tools()
+            tools = list(result.tools)
+            self._tools_cache[name] = (time.monotonic(), tools)
+            self._tools_dirty = True
+            return tools
+
+    async def get_all_tools(self) -> List[ToolDef]: 
+        """Recupera herramientas de TODOS los servidores conectados."""
+        return list(await self._build_all_tools())
+
+    async def _build_all_tools(self) -> List[ToolDef]:
+        """Reconstruye (si hace falta) las definiciones de todos los servidores."""
+        sessions = list(self.active_sessions.items())
+        if not self._tools_dirty and self._tools_fresh(sessions):
+            # Nada cambió desde la última reconstrucción: cero tráfico STDIO
+            return self.tools_cache
+
+        # Consultar todos los servidores en paralelo: latencia = max, no suma
+        results = await asyncio.gather(
+            *(self._list_tools_cached(name, session) for name, session in sessions),
+            return_exceptions=True,
+        )
+        server_tools = []
+        failed = False
+        for (name, session), tools in zip(sessions, results):
+            if isinstance(tools, BaseException):
+                logger.error("Error listing tools for %s: %s", name, tools)
+                failed = True
+                continue
+            server_tools.append((name, session, tools))
+
+        if not self._tools_dirty and not failed:
+            return self.tools_cache
 
-    async def get_all_tools(self) -> List[Dict[str, Any]]: 
-        """Recupera herramientas de TODOS los servidores conectados.""" 
         all_tools = [] 
         self.tool_lookup.clear()
         self.tool_definitions.clear()
-        for name, session in self.active_sessions.items(): 
-            try:
-                result = await session.list_tools() 
-                for tool in result.tools: 
-                    # Modificamos el nombre para evitar colisiones (ej: github_create_issue) 
-                    prefixed_name = f"{name}_{tool.name}"
-                    self.tool_lookup[prefixed_name] = (name, tool.name)
-                    
-                    tool_def = { 
-                        "name": prefixed_name, 
-                        "description": tool.description, 
-                        "inputSchema": tool.inputSchema, 
-                        "origin_session": session, # Guardamos ref para saber a quién llamar 
-                        "original_name": tool.name 
-                    } 
-                    self.tool_definitions[prefixed_name] = tool_def
-                    all_tools.append(tool_def) 
-            except Exception as e:
-                print(f"Error listing tools for {name}: {e}")
-        return all_tools 
+        self._required_args.clear()
+        for name, session, tools in server_tools:
+            for tool in tools: 
+                # Modificamos el nombre para evitar colisiones (ej: github_create_issue) 
+                prefixed_name = f"{name}_{tool.name}"
+                self.tool_lookup[prefixed_name] = (name, tool.name)
+                
+                tool_def = ToolDef(
+                    name=prefixed_name,
+                    description=tool.description,
+                    input_schema=tool.inputSchema,
+                    session=session,
+                    original_name=tool.name,
+                )
+                self.tool_definitions[prefixed_name] = tool_def
+                schema = tool.inputSchema
+                required = schema.get("required") if isinstance(schema, dict) else None
+                self._required_args[prefixed_name] = tuple(required) if isinstance(required, list) else ()
+                all_tools.append(tool_def) 
+        self.tools_cache = all_tools
+        # Si algún servidor falló, reintentar en la próxima llamada
+        self._tools_dirty = failed
+        return all_tools
 
     async def call_tool(self, tool_name: str, arguments: dict): 
         """Enruta la llamada al servidor MCP correcto.""" 
         
         if not isinstance(arguments, dict):
             arguments = {}
-        tool_def = self.tool_definitions.get(tool_name)
-        if tool_def:
-            schema = tool_def.get("inputSchema") or {}
-            required = schema.get("required") if isinstance(schema, dict) else None
-            if isinstance(required, list):
-                missing = [name for name in required if arguments.get(name) is None]
-                if missing:
-                    return f"Error: Missing required argument(s): {', '.join(missing)}"
+        required = self._required_args.get(tool_name)
+        if required:
+            missing = [name for name in required if arguments.get(name) is None]
+            if missing:
+                return f"Error: Missing required argument(s): {', '.join(missing)}"
 
         if tool_name in self.tool_lookup:
             server_id, real_tool_name = self.tool_lookup[tool_name]
@@ -221,78 +492,105 @@ class McpManager:
                 result = await session.call_tool(real_tool_name, arguments)  
                 # MCP result.content is a list of Content objects (TextContent, ImageContent, etc.)
                 # We need to serialize it to string for the LLM
-                output = []
-                for content in result.content:
-                    if hasattr(content, "text"):
-                        output.append(content.text)
-                    else:
-                        output.append(str(content))
-                return "\n".join(output)
+                return "\n".join(
+                    text if (text := getattr(content, "text", None)) is not None else str(content)
+                    for content in result.content
+                )
             except Exception as e:
+                logger.exception("Error executing MCP tool %s", tool_name)
                 return f"Error executing tool {tool_name}: {e}"
         return "Herramienta no encontrada."
     
+    @staticmethod
+    async def _hold_test_session(key: tuple, params: StdioServerParameters, ready: asyncio.Future, stop: asyncio.Event):
+        """Mantiene abierta una sesión de prueba hasta que expire su TTL o se descarte."""
+        try:
+            async with stdio_client(params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    _TEST_POOL[key] = [session, params, stop, asyncio.current_task(), time.monotonic()]
+                    ready.set_result(session)
+                    # Sweeper: cada sesión expira sola cuando deja de usarse
+                    while not stop.is_set():
+                        entry = _TEST_POOL.get(key)
+                        if entry is None:
+                            break
+                        remaining = _TEST_POOL_TTL - (time.monotonic() - entry[4])
+                        if remaining <= 0:
+                            break
+                        try:
+                            await asyncio.wait_for(stop.wait(), timeout=remaining)
+                        except asyncio.TimeoutError:
+                            pass
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+        except BaseException:
+            # Igual que en _run_server_task: anyio puede lanzar al cerrar el cancel scope
+            pass
+        finally:
+            if not ready.done():
+                ready.set_exception(RuntimeError("MCP test session closed"))
+            entry = _TEST_POOL.get(key)
+            if entry is not None and entry[2] is stop:
+                del _TEST_POOL[key]
+
+    async def _get_test_session(self, server_id: str, params: StdioServerParameters) -> tuple:
+        """
+        Devuelve (sesión de prueba, pooled) para estos parámetros; pooled es True si
+        la sesión venía del pool en lugar de acabar de lanzarse.
+        """
+        key = (server_id, id(params))
+        entry = _TEST_POOL.get(key)
+        if entry is not None and entry[1] is params and not entry[3].done():
+            entry[4] = time.monotonic()
+            return entry[0], True
+        # Los parámetros cambiaron: descartar sesiones anteriores del mismo servidor
+        for other_key, other in list(_TEST_POOL.items()):
+            if other_key[0] == server_id:
+                other[2].set()
+                _TEST_POOL.pop(other_key, None)
+        ready = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(self._hold_test_session(key, params, ready, asyncio.Event()))
+        _TEST_POOL_TASKS.add(task)
+        task.add_done_callback(_TEST_POOL_TASKS.discard)
+        return await ready, False
+
+    @staticmethod
+    def _discard_test_session(server_id: str, params: StdioServerParameters) -> None:
+        entry = _TEST_POOL.pop((server_id, id(params)), None)
+        if entry is not None:
+            entry[2].set()
+
     async def test_connection(self, server_id: str, settings: dict, registry: dict) -> Dict[str, Any]:
         """Prueba la conexión con un servidor MCP sin persistirla."""
         try:
-            # 1. Resolver el comando desde el Registry
-            definition = registry.get(server_id)
-            if not definition:
-                # Si no está en registry, ¿tal vez es una config custom completa?
-                # Por ahora asumimos que debe estar en registry o settings trae 'command'
-                if 'command' in settings:
-                    definition = settings
-                else:
-                    return {"success": False, "message": f"Server definition for {server_id} not found in registry"}
-
-            # 2. Preparar argumentos y variables de entorno
-            cmd = definition['command']
-            args = []
-            
-            # Merge definition args with potential overrides or format params
-            def_args = definition.get('args', [])
-            params = settings.get('params', {})
+            server_params, error = self._prepare_server_params(server_id, settings, registry)
+            if server_params is None:
+                return {"success": False, "message": error}
             
-            for arg in def_args:
-                formatted_arg = arg
+            session, pooled = await self._get_test_session(server_id, server_params)
+            try:
+                # Verificar listando herramientas
+                result = await session.list_tools()
+            except Exception:
+                # Un proceso roto no se queda en el pool
+                self._discard_test_session(server_id, server_params)
+                if not pooled:
+                    raise
+                # La sesión reutilizada pudo morir: reintentar una vez en frío
+                session, _ = await self._get_test_session(server_id, server_params)
                 try:
-                    if "{" in arg and "}" in arg:
-                        formatted_arg = arg.format(**params)
-                except KeyError as e:
-                    return {"success": False, "message": f"Missing param {e} for server {server_id}"}
-                args.append(formatted_arg)
-            
-            env = os.environ.copy()
-            if 'env_vars' in definition:
-                missing_envs = []
-                for env_var in definition['env_vars']:
-                    val = settings.get('env_vars', {}).get(env_var) or os.environ.get(env_var)
-                    if isinstance(val, str) and env_var.endswith("_BASE_URL") and not val.startswith(("http://", "https://")):
-                        val = f"https://{val.strip()}"
-                    if val:
-                        env[env_var] = val
-                    else:
-                        missing_envs.append(env_var)
-                if missing_envs:
-                    return {"success": False, "message": f"Faltan env vars: {', '.join(missing_envs)}"}
-
-            # 3. Iniciar conexión STDIO temporal
-            if stdio_client is None:
-                return {"success": False, "message": "MCP library not installed."}
-
-            server_params = StdioServerParameters(command=cmd, args=args, env=env)
-            
-            async with stdio_client(server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    # Verificar listando herramientas
                     result = await session.list_tools()
-                    tool_count = len(result.tools)
-                    return {
-                        "success": True, 
-                        "message": f"Conexión exitosa. Herramientas detectadas: {tool_count}",
-                        "tools_count": tool_count
-                    }
+                except Exception:
+                    self._discard_test_session(server_id, server_params)
+                    raise
+            tool_count = len(result.tools)
+            return {
+                "success": True, 
+                "message": f"Conexión exitosa. Herramientas detectadas: {tool_count}",
+                "tools_count": tool_count
+            }
                     
         except Exception as e:
             return {"success": False, "message": str(e)}
@@ -300,8 +598,8 @@ class McpManager:
     async def cleanup(self):
         """Close all sessions."""
         # Signal all tasks to shutdown
-        for name, event in self._shutdown_events.items():
-            event.set()
+        for stop in self._stop_futures.values():
+            _resolve(stop)
         
         # Wait for tasks to finish
         if self._server_tasks:
@@ -312,10 +610,16 @@ class McpManager:
                     timeout=2.0
                 )
             except asyncio.TimeoutError:
-                print("Warning: Timed out waiting for MCP servers to shutdown")
+                logger.warning("Timed out waiting for MCP servers to shutdown")
         
         self.active_sessions.clear()
         self._server_tasks.clear()
-        self._shutdown_events.clear()
+        self._stop_futures.clear()
         self.tool_lookup.clear()
         self.tool_definitions.clear()
+        self._required_args.clear()
+        self._tools_cache.clear()
+        self._tools_locks.clear()
+        self._last_sync_hash = None
+        self.tools_cache = []
+        self._tools_dirty = True
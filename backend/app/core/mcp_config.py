@@ -1,7 +1,13 @@
-import json
+import contextlib
+import contextvars
+import copy
+import functools
 import os
+import sys
 import time
-from typing import Any
+from typing import Any, Iterator
+
+import orjson
 
 from app.core.persistence import get_app_setting, set_app_setting
 
@@ -10,44 +16,120 @@ CONFIG_KEY = "mcp_active_config"
 REGISTRY_KEY = "mcp_registry_custom"
 SOURCES_KEY = "mcp_registry_sources"
 ENCRYPTED_FLAG = "__encrypted__"
+_MASKED = sys.intern("__masked__")
 
+# Resolved once at import: abspath() calls getcwd(), so avoid it per lookup.
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_REGISTRY_PATH = os.path.join(_ROOT, "app/data/mcp_registry.json")
+_LEGACY_CONFIG_PATH = os.path.join(_ROOT, "app/settings/active_mcp.json")
 
-def _get_cipher():
-    key = os.getenv("NAVIBOT_MCP_ENCRYPTION_KEY") or os.getenv("NAVIBOT_MCP_KEY")
+# Bumped by every setter that changes the stored config or custom registry.
+# Derived views are cached as (version, source file mtime, value).
+_CFG_VERSION = 0
+_ACTIVE_CACHE: tuple[int, int, dict[str, Any]] | None = None
+_VIEWS_CACHE: tuple[int, int, tuple[dict[str, Any], dict[str, Any]]] | None = None
+_REGISTRY_CACHE: tuple[int, int, dict[str, Any]] | None = None
+
+
+# Outcome of validating the configured key, computed once per key value so a
+# rotation is picked up: state is "unset", "missing", "invalid" or "ready".
+_CIPHER_STATE: str = "unset"
+_CIPHER_KEY: str | None = None
+_CIPHER: Any = None
+_CIPHER_ERROR: str = ""
+
+
+_FERNET_CLS: Any = None
+
+
+def _load_fernet() -> Any:
+    """
+    Imports the Fernet implementation once per process.
+
+    Prefers the Rust `rfernet` package (same token format, much cheaper for the
+    small env_vars payloads) and falls back to `cryptography`.
+    """
+    global _FERNET_CLS
+    if _FERNET_CLS is None:
+        try:
+            from rfernet import Fernet
+        except ImportError:
+            try:
+                from cryptography.fernet import Fernet
+            except Exception:
+                raise ValueError("cryptography no está instalado")
+        _FERNET_CLS = Fernet
+    return _FERNET_CLS
+
+
+def _init_cipher(key: str | None) -> None:
+    global _CIPHER_STATE, _CIPHER_KEY, _CIPHER, _CIPHER_ERROR
+    _CIPHER_KEY = key
+    _CIPHER = None
+    _CIPHER_ERROR = ""
+    _decrypt_ciphertext.cache_clear()
     if not key:
-        return None
+        _CIPHER_STATE = "missing"
+        return
     try:
-        from cryptography.fernet import Fernet
-    except Exception:
-        raise ValueError("cryptography no está instalado")
+        fernet_cls = _load_fernet()
+    except ValueError as e:
+        _CIPHER_STATE = "invalid"
+        _CIPHER_ERROR = str(e)
+        return
     try:
-        return Fernet(key.encode("utf-8"))
+        # Both implementations accept the urlsafe-base64 key as str
+        _CIPHER = fernet_cls(key)
     except Exception:
-        raise ValueError("clave de cifrado inválida")
+        _CIPHER_STATE = "invalid"
+        _CIPHER_ERROR = "clave de cifrado inválida"
+        return
+    _CIPHER_STATE = "ready"
+
+
+def _get_cipher():
+    key = os.getenv("NAVIBOT_MCP_ENCRYPTION_KEY") or os.getenv("NAVIBOT_MCP_KEY")
+    if _CIPHER_STATE == "unset" or key != _CIPHER_KEY:
+        _init_cipher(key)
+    if _CIPHER_STATE == "ready":
+        return _CIPHER
+    if _CIPHER_STATE == "missing":
+        return None
+    raise ValueError(_CIPHER_ERROR)
 
 
 def _encrypt_payload(payload: dict[str, Any]) -> dict[str, Any]:
     cipher = _get_cipher()
     if cipher is None:
         return payload
-    raw = json.dumps(payload, ensure_ascii=False)
-    token = cipher.encrypt(raw.encode("utf-8")).decode("utf-8")
+    raw = orjson.dumps(payload)
+    token = cipher.encrypt(raw).decode("utf-8")
     return {ENCRYPTED_FLAG: True, "ciphertext": token, "version": 1}
 
 
-def _decrypt_payload(payload: dict[str, Any]) -> dict[str, Any]:
+@functools.lru_cache(maxsize=256)
+def _decrypt_ciphertext(token: str) -> tuple[tuple[str, Any], ...]:
+    """Decrypts one token into immutable (key, value) pairs; env_vars rarely change but are read often."""
     cipher = _get_cipher()
     if cipher is None:
         raise ValueError("clave de cifrado requerida para mcp_config")
-    token = payload.get("ciphertext")
-    if not isinstance(token, str) or not token:
-        return {}
     try:
-        raw = cipher.decrypt(token.encode("utf-8")).decode("utf-8")
-        data = json.loads(raw)
-        return data if isinstance(data, dict) else {}
+        raw = cipher.decrypt(token.encode("utf-8"))
+        data = orjson.loads(raw)
     except Exception:
         raise ValueError("no se pudo descifrar mcp_config")
+    if not isinstance(data, dict):
+        return ()
+    return tuple(data.items())
+
+
+def _decrypt_payload(payload: dict[str, Any]) -> dict[str, Any]:
+    if _get_cipher() is None:
+        raise ValueError("clave de cifrado requerida para mcp_config")
+    token = payload.get("ciphertext")
+    if not isinstance(token, str) or not token:
+        return {}
+    return dict(_decrypt_ciphertext(token))
 
 
 def _decrypt_env_vars(value: Any) -> dict[str, str]:
@@ -63,26 +145,103 @@ def _decrypt_env_vars(value: Any) -> dict[str, str]:
 
 
 def _mask_env_vars(env_vars: dict[str, str]) -> dict[str, str]:
-    return {key: "__masked__" for key in env_vars.keys()}
+    return dict.fromkeys(env_vars, _MASKED)
+
+
+# Writes deferred by an open transaction(): key -> value. None when no transaction is open.
+_PENDING_WRITES: contextvars.ContextVar[dict[str, Any] | None] = contextvars.ContextVar(
+    "mcp_config_pending_writes", default=None
+)
+
+
+def _read_setting(key: str) -> Any:
+    pending = _PENDING_WRITES.get()
+    if pending is not None and key in pending:
+        return pending[key]
+    return get_app_setting(key)
+
+
+def _in_transaction() -> bool:
+    # Pending values are private to this context: derived caches must neither serve nor store them
+    return _PENDING_WRITES.get() is not None
+
+
+def _write_setting(key: str, value: Any) -> None:
+    pending = _PENDING_WRITES.get()
+    if pending is not None:
+        pending[key] = value
+        return
+    set_app_setting(key, value)
+
+
+@contextlib.contextmanager
+def transaction() -> Iterator[None]:
+    """
+    Coalesces config writes: each key is persisted once, when the block exits.
+
+    Reads inside the block see the pending values and bypass the cached views, so
+    uncommitted values never reach other readers. Nested blocks join the outer one.
+    On error nothing is written and the cached views are invalidated.
+    """
+    if _PENDING_WRITES.get() is not None:
+        yield
+        return
+    pending: dict[str, Any] = {}
+    token = _PENDING_WRITES.set(pending)
+    try:
+        yield
+    except BaseException:
+        _PENDING_WRITES.reset(token)
+        _decrypt_ciphertext.cache_clear()
+        _bump_config_version()
+        raise
+    _PENDING_WRITES.reset(token)
+    for key, value in pending.items():
+        set_app_setting(key, value)
+    # Other contexts may have cached the pre-commit values under the current version
+    _bump_config_version()
+
+
+def _bump_config_version() -> None:
+    global _CFG_VERSION
+    _CFG_VERSION += 1
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
 
 
 def _paths() -> dict[str, str]:
-    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     return {
-        "registry": os.path.join(root, "app/data/mcp_registry.json"),
-        "legacy_config": os.path.join(root, "app/settings/active_mcp.json"),
+        "registry": _REGISTRY_PATH,
+        "legacy_config": _LEGACY_CONFIG_PATH,
     }
 
 
+# path -> (st_mtime_ns, parsed data); unchanged files cost a single stat()
+_LOAD_JSON_CACHE: dict[str, tuple[int, Any]] = {}
+
+
 def _load_json(path: str) -> dict[str, Any]:
-    if not os.path.exists(path):
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        _LOAD_JSON_CACHE.pop(path, None)
         return {}
-    with open(path, "r") as f:
-        return json.load(f)
+    cached = _LOAD_JSON_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        data = orjson.loads(f.read())
+    _LOAD_JSON_CACHE[path] = (mtime, data)
+    return data
 
 
 def get_registry_custom() -> dict[str, Any]:
-    data = get_app_setting(REGISTRY_KEY)
+    data = _read_setting(REGISTRY_KEY)
     if isinstance(data, dict):
         return data
     return {}
@@ -91,11 +250,12 @@ def get_registry_custom() -> dict[str, Any]:
 def set_registry_custom(registry: dict[str, Any]) -> None:
     if not isinstance(registry, dict):
         raise ValueError("registry inválido")
-    set_app_setting(REGISTRY_KEY, registry)
+    _write_setting(REGISTRY_KEY, registry)
+    _bump_config_version()
 
 
 def get_registry_sources() -> dict[str, Any]:
-    data = get_app_setting(SOURCES_KEY)
+    data = _read_setting(SOURCES_KEY)
     if isinstance(data, dict):
         return data
     return {"sources": []}
@@ -104,17 +264,26 @@ def get_registry_sources() -> dict[str, Any]:
 def set_registry_sources(payload: dict[str, Any]) -> None:
     if not isinstance(payload, dict):
         raise ValueError("payload inválido")
-    set_app_setting(SOURCES_KEY, payload)
+    _write_setting(SOURCES_KEY, payload)
 
 
 def get_registry_merged() -> dict[str, Any]:
+    global _REGISTRY_CACHE
     paths = _paths()
+    mtime = _mtime(paths["registry"])
+    in_tx = _in_transaction()
+    cached = _REGISTRY_CACHE
+    if not in_tx and cached is not None and cached[0] == _CFG_VERSION and cached[1] == mtime:
+        return cached[2]
+    version = _CFG_VERSION
     registry = _load_json(paths["registry"])
     custom = get_registry_custom()
     merged = {**registry, **custom}
     for key, value in merged.items():
         if isinstance(value, dict) and "source" not in value:
             value["source"] = "built-in" if key in registry else "custom"
+    if not in_tx:
+        _REGISTRY_CACHE = (version, mtime, merged)
     return merged
 
 
@@ -123,7 +292,8 @@ def _legacy_to_config() -> dict[str, Any]:
     legacy = _load_json(paths["legacy_config"])
     if not isinstance(legacy, dict) or not legacy:
         return {"servers": {}}
-    return {"servers": legacy}
+    # Copy: _load_json returns the cached object and callers mutate "servers"
+    return {"servers": dict(legacy)}
 
 
 def _merge_legacy_config(current: dict[str, Any], legacy: dict[str, Any]) -> tuple[dict[str, Any], bool]:
@@ -170,49 +340,88 @@ def _merge_legacy_config(current: dict[str, Any], legacy: dict[str, Any]) -> tup
     return current, updated
 
 
-def get_active_config() -> dict[str, Any]:
-    data = get_app_setting(CONFIG_KEY)
+def _read_active_config() -> tuple[dict[str, Any], bool]:
+    """Reads the stored config merged with the legacy file; the flag is True if it wrote back."""
+    data = _read_setting(CONFIG_KEY)
     if isinstance(data, dict) and "servers" in data:
         legacy = _legacy_to_config()
         merged, updated = _merge_legacy_config(data, legacy)
         if updated:
-            set_app_setting(CONFIG_KEY, merged)
-        return merged
+            _write_setting(CONFIG_KEY, merged)
+        return merged, updated
     legacy = _legacy_to_config()
     if legacy.get("servers"):
         merged, _ = _merge_legacy_config({"servers": {}}, legacy)
-        set_app_setting(CONFIG_KEY, merged)
-    return legacy
+        _write_setting(CONFIG_KEY, merged)
+        return legacy, True
+    return legacy, False
 
 
-def get_active_config_runtime() -> dict[str, Any]:
+def get_active_config() -> dict[str, Any]:
+    global _ACTIVE_CACHE
+    mtime = _mtime(_paths()["legacy_config"])
+    in_tx = _in_transaction()
+    cached = _ACTIVE_CACHE
+    if not in_tx and cached is not None and cached[0] == _CFG_VERSION and cached[1] == mtime:
+        # Callers mutate the returned config before writing it back
+        return copy.deepcopy(cached[2])
+    version = _CFG_VERSION
+    config, wrote = _read_active_config()
+    # After a legacy migration the stored value differs from what we return, so only
+    # snapshot reads that left the DB untouched.
+    if not wrote and not in_tx:
+        _ACTIVE_CACHE = (version, mtime, copy.deepcopy(config))
+    return config
+
+
+def get_active_config_views() -> tuple[dict[str, Any], dict[str, Any]]:
+    """
+    Returns (runtime, public) views of the active config from a single pass.
+
+    env_vars are decrypted once per server: the runtime view keeps the plaintext,
+    the public view masks the same keys.
+    """
+    global _VIEWS_CACHE
+    mtime = _mtime(_paths()["legacy_config"])
+    in_tx = _in_transaction()
+    cached = _VIEWS_CACHE
+    if not in_tx and cached is not None and cached[0] == _CFG_VERSION and cached[1] == mtime:
+        return cached[2]
+    version = _CFG_VERSION
     config = get_active_config()
-    servers = {}
+    runtime_servers = {}
+    public_servers = {}
     for server_id, settings in config.get("servers", {}).items():
         env_vars = _decrypt_env_vars(settings.get("env_vars"))
-        servers[server_id] = {
-            "enabled": bool(settings.get("enabled", False)),
-            "params": settings.get("params", {}) or {},
+        enabled = bool(settings.get("enabled", False))
+        params = settings.get("params", {}) or {}
+        runtime_entry = {
+            "enabled": enabled,
+            "params": params,
             "env_vars": env_vars,
         }
         if "command" in settings:
-            servers[server_id]["command"] = settings.get("command")
+            runtime_entry["command"] = settings.get("command")
         if "args" in settings:
-            servers[server_id]["args"] = settings.get("args")
-    return {"servers": servers}
+            runtime_entry["args"] = settings.get("args")
+        runtime_servers[server_id] = runtime_entry
+        public_servers[server_id] = {
+            "enabled": enabled,
+            "params": params,
+            "env_vars": _mask_env_vars(env_vars),
+        }
+    views = ({"servers": runtime_servers}, {"servers": public_servers})
+    if not in_tx:
+        _VIEWS_CACHE = (version, mtime, views)
+    return views
+
+
+def get_active_config_runtime() -> dict[str, Any]:
+    return get_active_config_views()[0]
 
 
 def get_active_config_public() -> dict[str, Any]:
-    config = get_active_config()
-    servers = {}
-    for server_id, settings in config.get("servers", {}).items():
-        env_vars = _decrypt_env_vars(settings.get("env_vars"))
-        servers[server_id] = {
-            "enabled": bool(settings.get("enabled", False)),
-            "params": settings.get("params", {}) or {},
-            "env_vars": _mask_env_vars(env_vars),
-        }
-    return {"servers": servers}
+    return get_active_config_views()[1]
 
 
 def upsert_server_config(server_id: str, settings: dict[str, Any], keep_masked: bool = True) -> None:
@@ -241,7 +450,16 @@ def upsert_server_config(server_id: str, settings: dict[str, Any], keep_masked:
     if "args" in settings:
         servers[server_id]["args"] = settings.get("args")
     config["servers"] = servers
-    set_app_setting(CONFIG_KEY, config)
+    _write_setting(CONFIG_KEY, config)
+    _decrypt_ciphertext.cache_clear()
+    _bump_config_version()
+
+
+def bulk_update_servers(updates: dict[str, dict[str, Any]], keep_masked: bool = True) -> None:
+    """Applies several upserts and persists the config once."""
+    with transaction():
+        for server_id, settings in updates.items():
+            upsert_server_config(server_id, settings, keep_masked=keep_masked)
 
 
 def delete_server_config(server_id: str) -> bool:
@@ -250,15 +468,31 @@ def delete_server_config(server_id: str) -> bool:
     if server_id in servers:
         del servers[server_id]
         config["servers"] = servers
-        set_app_setting(CONFIG_KEY, config)
+        _write_setting(CONFIG_KEY, config)
+        _decrypt_ciphertext.cache_clear()
+        _bump_config_version()
         return True
     return False
 
 
+_STAMP_CACHE: tuple[int, str] = (-1, "")
+
+
+def _utc_stamp() -> str:
+    """ISO-8601 UTC timestamp (second resolution), formatted once per second."""
+    global _STAMP_CACHE
+    now = int(time.time())
+    cached_at, stamp = _STAMP_CACHE
+    if cached_at != now:
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))
+        _STAMP_CACHE = (now, stamp)
+    return stamp
+
+
 def update_registry_entry(server_id: str, definition: dict[str, Any]) -> None:
     registry = get_registry_custom()
     definition = dict(definition)
-    definition["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    definition["updated_at"] = _utc_stamp()
     registry[server_id] = definition
     set_registry_custom(registry)
 
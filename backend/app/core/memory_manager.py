@@ -1,7 +1,10 @@
 
 import os
 import logging
-from mem0 import Memory
+import queue
+import threading
+import time
+from functools import lru_cache
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,10 +12,21 @@ logger = logging.getLogger(__name__)
 
 _memory_instance = None
 
+# Write micro-batching: the writer groups up to N texts, or waits at most this
+# long, before sending a single memory.add() per user.
+_WRITE_BATCH_SIZE = 32
+_WRITE_BATCH_WINDOW = 0.05
+_STOP = object()
+_QUERY_EMBED_CACHE_SIZE = 1024
+
 class AgentMemory:
     def __init__(self):
         self.memory = None
         self._closed = False
+        self._write_queue: queue.Queue = queue.Queue()
+        self._writer: threading.Thread | None = None
+        self._pending = 0
+        self._pending_cv = threading.Condition()
         
         try:
             api_key = os.getenv("GOOGLE_API_KEY")
@@ -21,6 +35,11 @@ class AgentMemory:
                 self._closed = True
                 return
 
+            # Imported here rather than at module level: mem0 pulls in the Qdrant
+            # client and provider SDKs, which would otherwise load for every
+            # importer of this module even when memory is never used.
+            from mem0 import Memory
+
             # Configuration for Mem0 with Google GenAI
             # Using Qdrant for local vector storage
             config = {
@@ -48,26 +67,104 @@ class AgentMemory:
             }
             
             self.memory = Memory.from_config(config)
+            self._cache_query_embeddings()
             logger.info("✅ Mem0 initialized successfully with Gemini.")
             
         except Exception as e:
             logger.error(f"⚠️  Failed to initialize Mem0: {e}")
             self._closed = True
 
+    def _cache_query_embeddings(self):
+        """
+        Wraps Mem0's embedder so search queries are embedded once per distinct
+        text. Each embed is a Gemini API round trip and recall queries repeat a lot.
+        """
+        embedder = getattr(self.memory, "embedding_model", None)
+        original = getattr(embedder, "embed", None)
+        if original is None:
+            return
+
+        @lru_cache(maxsize=_QUERY_EMBED_CACHE_SIZE)
+        def _embed_query(text: str, *args) -> tuple:
+            return tuple(original(text, *args))
+
+        def embed(text, *args, **kwargs):
+            action = args[0] if args else kwargs.get("memory_action")
+            if action == "search" and isinstance(text, str) and not kwargs:
+                return list(_embed_query(text, *args))
+            return original(text, *args, **kwargs)
+
+        embedder.embed = embed
+
     def add_interaction(self, user_id: str, text: str, metadata: dict = None):
         """
         Store a text snippet in memory (Mem0 extracts facts automatically).
+        The write is queued and flushed in batches by a background thread.
         """
         if self._closed or self.memory is None:
             return False
-            
-        try:
-            self.memory.add(text, user_id=user_id, metadata=metadata)
-            logger.info(f"✅ Memory stored for user {user_id}: {text[:50]}...")
-            return True
-        except Exception as e:
-            logger.error(f"⚠️  Failed to add memory: {e}")
-            return False
+
+        with self._pending_cv:
+            self._pending += 1
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._drain_writes, name="mem0-writer", daemon=True
+                )
+                self._writer.start()
+        self._write_queue.put((user_id, text, metadata))
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Blocks until every queued write has been sent to Mem0."""
+        with self._pending_cv:
+            return self._pending_cv.wait_for(lambda: self._pending == 0, timeout)
+
+    def _drain_writes(self):
+        while True:
+            item = self._write_queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + _WRITE_BATCH_WINDOW
+            stop = False
+            while len(batch) < _WRITE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._write_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop = True
+                    break
+                batch.append(nxt)
+            try:
+                self._write_batch(batch)
+            finally:
+                with self._pending_cv:
+                    self._pending -= len(batch)
+                    self._pending_cv.notify_all()
+            if stop:
+                return
+
+    def _write_batch(self, batch: list[tuple]):
+        # Group by (user_id, metadata) so each group is a single add()
+        groups: list[tuple[str, dict | None, list[dict]]] = []
+        for user_id, text, metadata in batch:
+            for g_user, g_meta, messages in groups:
+                if g_user == user_id and g_meta == metadata:
+                    messages.append({"role": "user", "content": text})
+                    break
+            else:
+                groups.append((user_id, metadata, [{"role": "user", "content": text}]))
+
+        for user_id, metadata, messages in groups:
+            try:
+                self.memory.add(messages, user_id=user_id, metadata=metadata)
+                logger.info(f"✅ Memory stored for user {user_id}: {len(messages)} item(s)")
+            except Exception as e:
+                logger.error(f"⚠️  Failed to add memory: {e}")
 
     def search_memory(self, user_id: str, query: str, n_results: int = 3) -> list[str]:
         """
@@ -77,6 +174,7 @@ class AgentMemory:
         if self._closed or self.memory is None:
             return []
             
+        self.flush()
         try:
             results = self.memory.search(query, user_id=user_id, limit=n_results)
             # Mem0 returns dicts: {'results': [{'memory': '...', ...}]}
@@ -110,6 +208,7 @@ class AgentMemory:
         if self._closed or self.memory is None:
             return []
             
+        self.flush()
         try:
             results = self.memory.get_all(user_id=user_id)
             if isinstance(results, dict) and 'results' in results:
@@ -123,8 +222,13 @@ class AgentMemory:
 
     def close(self):
         """
-        Mem0 doesn't require explicit closing, but we maintain the interface.
+        Drains pending writes and stops the writer thread.
         """
+        if self._writer is not None:
+            self.flush(timeout=10)
+            self._write_queue.put(_STOP)
+            self._writer.join(timeout=1)
+            self._writer = None
         self._closed = True
         logger.info("Memory system marked as closed.")
 
@@ -1,9 +1,32 @@
 import logging
+import re
+from functools import lru_cache
 from typing import Optional, Any
 from app.core.config_manager import get_settings, resolve_model, RoutingConfig
 
 logger = logging.getLogger(__name__)
 
+# Agent role -> RoleConfig attribute holding the assigned model
+_ROLE_TO_ATTR = {
+    "supervisor": "supervisor_model",
+    "search_worker": "search_worker_model",
+    "code_worker": "code_worker_model",
+    "voice_worker": "voice_worker_model",
+    "scheduled_worker": "scheduled_worker_model",
+    "image_worker": "image_worker_model",
+}
+
+@lru_cache(maxsize=64)
+def _is_pro_model(model_name: str) -> bool:
+    return "pro" in model_name.lower()
+
+@lru_cache(maxsize=16)
+def _compile_triggers(triggers: tuple[str, ...]) -> Optional[re.Pattern]:
+    """A single regex for all retry_triggers (recompiled only when they change)."""
+    if not triggers:
+        return None
+    return re.compile("|".join(map(re.escape, triggers)))
+
 class ModelOrchestrator:
     """
     Orchestrates model selection and adaptive scaling logic based on configuration.
@@ -39,26 +62,13 @@ class ModelOrchestrator:
         role_config = settings.role_config
         emergency_mode = settings.emergency_mode
         
-        # Default mapping
-        model_name = settings.current_model
-        
-        if role == "supervisor":
-            model_name = role_config.supervisor_model
-        elif role == "search_worker":
-            model_name = role_config.search_worker_model
-        elif role == "code_worker":
-            model_name = role_config.code_worker_model
-        elif role == "voice_worker":
-            model_name = role_config.voice_worker_model
-        elif role == "scheduled_worker":
-            model_name = role_config.scheduled_worker_model
-        elif role == "image_worker":
-            model_name = role_config.image_worker_model
+        attr = _ROLE_TO_ATTR.get(role)
+        model_name = getattr(role_config, attr) if attr else settings.current_model
             
         # Emergency Mode Logic: Downgrade Pro models to Flash
         if emergency_mode:
             # Simple heuristic: if model name contains "pro", switch to "flash"
-            if "pro" in model_name.lower():
+            if _is_pro_model(model_name):
                 logger.info(f"ModelOrchestrator: Emergency mode active. Downgrading {model_name} to gemini-flash-latest")
                 return "gemini-flash-latest"
                 
@@ -96,9 +106,10 @@ class ModelOrchestrator:
             error_msg = str(error)
             error_full = f"{error_type}: {error_msg}"
             
-            for trigger in routing.retry_triggers:
-                if trigger in error_full:
-                    logger.info(f"ModelOrchestrator: Upgrading from {current_model} to {fallback_model} due to error trigger: {trigger}")
-                    return fallback_model
+            pattern = _compile_triggers(tuple(routing.retry_triggers))
+            match = pattern.search(error_full) if pattern else None
+            if match:
+                logger.info(f"ModelOrchestrator: Upgrading from {current_model} to {fallback_model} due to error trigger: {match.group(0)}")
+                return fallback_model
         
         return None
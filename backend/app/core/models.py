@@ -1,42 +1,103 @@
+import asyncio
 import os
+import time
 from google import genai
-from typing import List, Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-async def get_available_gemini_models() -> List[Dict[str, Any]]:
+# The model list changes on a scale of days; it is cached per API key
+_MODELS_CACHE_TTL = 300.0
+_models_cache: Optional[tuple[str, float, List[Dict[str, Any]], List[Dict[str, Any]]]] = None
+_models_lock = asyncio.Lock()
+_client: Optional[tuple[str, genai.Client]] = None
+
+
+def _get_client(api_key: str) -> genai.Client:
+    global _client
+    if _client is None or _client[0] != api_key:
+        _client = (api_key, genai.Client(api_key=api_key))
+    return _client[1]
+
+
+def _cached_models(api_key: str) -> Optional[tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """Returns (models in API order, models sorted by display name) if still fresh."""
+    if _models_cache is None:
+        return None
+    key, fetched_at, listed, ordered = _models_cache
+    if key != api_key or time.monotonic() - fetched_at >= _MODELS_CACHE_TTL:
+        return None
+    return listed, ordered
+
+
+def _sorted(models: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Sort by display name for better UI
+    return sorted(models, key=lambda x: x["display_name"])
+
+
+async def _iter_supported_models(client: genai.Client) -> AsyncIterator[Dict[str, Any]]:
+    """Yields content-generation models as each page of the listing arrives."""
+    # Use async iterator for listing models
+    pager = await client.aio.models.list()
+    async for m in pager:
+        # Check for content generation capability
+        methods = m.supported_actions or []
+        if 'generateContent' in methods:
+            # Clean up ID (remove 'models/' prefix if present)
+            model_id = m.name
+            if model_id.startswith('models/'):
+                model_id = model_id[7:]
+
+            yield {
+                "id": model_id,
+                "display_name": m.display_name or model_id,
+                "description": m.description or "",
+                "input_token_limit": m.input_token_limit,
+                "output_token_limit": m.output_token_limit
+            }
+
+
+async def get_available_gemini_models(limit: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Obtiene la lista de modelos que soportan generación de contenido.
+    Con `limit` deja de paginar en cuanto tiene esa cantidad (los primeros que
+    devuelve la API, ordenados); sin él se cachea la lista completa.
     """
+    global _models_cache
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         return []
 
-    client = genai.Client(api_key=api_key)
-    models = []
-    
-    try:
-        # Use async iterator for listing models
-        pager = await client.aio.models.list()
-        async for m in pager:
-            # Check for content generation capability
-            methods = m.supported_actions or []
-            if 'generateContent' in methods:
-                # Clean up ID (remove 'models/' prefix if present)
-                model_id = m.name
-                if model_id.startswith('models/'):
-                    model_id = model_id[7:]
-                    
-                models.append({
-                    "id": model_id,
-                    "display_name": m.display_name or model_id,
-                    "description": m.description or "",
-                    "input_token_limit": m.input_token_limit,
-                    "output_token_limit": m.output_token_limit
-                })
-                
-        # Sort by display name for better UI
-        models.sort(key=lambda x: x["display_name"])
-        return models
-        
-    except Exception as e:
-        print(f"Error listando modelos: {e}")
+    if limit is not None and limit <= 0:
         return []
+
+    cached = _cached_models(api_key)
+    if cached is not None:
+        listed, ordered = cached
+        return _sorted(listed[:limit]) if limit is not None else ordered
+
+    client = _get_client(api_key)
+    if limit is not None:
+        models = []
+        try:
+            async for model in _iter_supported_models(client):
+                models.append(model)
+                if len(models) >= limit:
+                    break
+        except Exception as e:
+            print(f"Error listando modelos: {e}")
+            return []
+        return _sorted(models)
+
+    async with _models_lock:
+        # Another request may have filled it while we waited for the lock
+        cached = _cached_models(api_key)
+        if cached is not None:
+            return cached[1]
+
+        try:
+            listed = [model async for model in _iter_supported_models(client)]
+        except Exception as e:
+            print(f"Error listando modelos: {e}")
+            return []
+        ordered = _sorted(listed)
+        _models_cache = (api_key, time.monotonic(), listed, ordered)
+        return ordered
@@ -1,26 +1,76 @@
 import asyncio
+import atexit
 import functools
 import json
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, create_engine, text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, create_engine, event, func, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import DisconnectionError, OperationalError, TimeoutError as SQLAlchemyTimeoutError
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import orjson
 
 from app.core.runtime_context import get_session_id
 
 
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 _engine = None
 _session_local = None
 
+# Write-behind for chat_messages/tool_calls: rows accumulate in memory and a
+# thread writes them in one transaction (up to _WRITE_BATCH_SIZE rows or after
+# _WRITE_FLUSH_INTERVAL seconds). db_session() drains the buffer before opening
+# a session, so every read sees earlier writes.
+# A batch hitting a transient error goes back to the front of the buffer and the
+# writer retries with exponential backoff; after _WRITE_MAX_RETRIES failures in a
+# row the error is logged and save_* flush on the caller's thread, which gets the
+# exception.
+_WRITE_BATCH_SIZE = 64
+_WRITE_FLUSH_INTERVAL = 0.05
+_WRITE_MAX_RETRIES = 5
+_WRITE_RETRY_BASE = 0.1
+_WRITE_RETRY_MAX = 5.0
+_pending_writes: list[tuple[type, dict[str, Any]]] = []
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flush_event = threading.Event()
+_flusher: Optional[threading.Thread] = None
+_write_error: Optional[Exception] = None
+# Errors that may clear up on retry (locked database, dropped connection); any
+# other error points at a row that will never be written
+_TRANSIENT_WRITE_ERRORS = (OperationalError, DisconnectionError, SQLAlchemyTimeoutError)
+
+# session_id -> monotonic time of the last sessions.updated_at touch. Within the
+# _SESSION_TOUCH_INTERVAL window, _ensure_session skips the database.
+_SESSION_TOUCH_INTERVAL = 30.0
+_known_sessions: dict[str, float] = {}
+
 
 def _utcnow() -> datetime:
     return datetime.now(tz=timezone.utc)
 
 
+def _dumps(value: Any) -> str:
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+# orjson.loads accepts str and bytes; its JSONDecodeError subclasses json.JSONDecodeError
+_loads = orjson.loads
+
+
 class SessionRecord(Base):
     __tablename__ = "sessions"
     id = Column(String, primary_key=True)
@@ -64,33 +114,87 @@ class SessionSetting(Base):
     updated_at = Column(DateTime, default=_utcnow, nullable=False)
 
 
+Index("ix_sessions_updated", SessionRecord.updated_at)
 Index("ix_app_settings_updated", AppSetting.updated_at)
 Index("ix_session_settings_updated", SessionSetting.updated_at)
 
 
 Index("ix_chat_messages_session_created", ChatMessage.session_id, ChatMessage.created_at)
+# Paging by id DESC. On SQLite ix_chat_messages_session_id already serves it (the
+# index carries the implicit rowid); Postgres needs the composite index.
+Index(
+    "ix_chat_messages_session_id_desc",
+    ChatMessage.session_id,
+    ChatMessage.id.desc(),
+).ddl_if(dialect="postgresql")
 
 
 def get_db_url() -> str:
     return os.getenv("NAVIBOT_DB_URL", "sqlite:///navibot.db")
 
 
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, _record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in _SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return ":memory:" in url or url.rstrip("/") == "sqlite:"
+
+
 def get_engine():
     global _engine, _session_local
     if _engine is None:
         url = get_db_url()
-        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
-        _engine = create_engine(url, future=True, connect_args=connect_args)
+        if url.startswith("sqlite"):
+            connect_args = {"check_same_thread": False}
+            if _is_sqlite_memory(url):
+                # One shared connection: every :memory: connection is a separate
+                # database, and the background writer writes from another thread.
+                pool_kwargs: dict[str, Any] = {"poolclass": StaticPool}
+            else:
+                # Persistent connections keep SQLite's page cache warm across sessions
+                pool_kwargs = {"pool_size": 8, "max_overflow": 16}
+            _engine = create_engine(url, future=True, connect_args=connect_args, **pool_kwargs)
+            event.listen(_engine, "connect", _apply_sqlite_pragmas)
+        else:
+            _engine = create_engine(url, future=True, pool_pre_ping=True)
         _session_local = sessionmaker(bind=_engine, expire_on_commit=False, future=True)
+        _known_sessions.clear()
     return _engine
 
 
 def init_db() -> None:
     engine = get_engine()
     Base.metadata.create_all(engine)
+    _create_missing_indexes(engine)
     _run_sqlite_migrations(engine)
 
 
+def _create_missing_indexes(engine) -> None:
+    """
+    create_all() skips existing tables together with their indexes, so indexes
+    added after a database was created are created here (IF NOT EXISTS).
+    """
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
 def _run_sqlite_migrations(engine) -> None:
     url = str(engine.url)
     if not url.startswith("sqlite"):
@@ -113,6 +217,7 @@ def _get_session() -> Session:
 
 @contextmanager
 def db_session():
+    _flush_quietly()
     session = _get_session()
     try:
         yield session
@@ -124,25 +229,244 @@ def db_session():
         session.close()
 
 
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
 def _ensure_session(db: Session, session_id: str) -> None:
     if not session_id:
         raise ValueError("session_id vacío")
-    existing = db.get(SessionRecord, session_id)
-    if existing is None:
-        db.add(SessionRecord(id=session_id))
+    now = time.monotonic()
+    touched_at = _known_sessions.get(session_id)
+    if touched_at is not None and now - touched_at < _SESSION_TOUCH_INTERVAL:
+        return
+    insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        ts = _utcnow()
+        stmt = insert(SessionRecord).values(
+            id=session_id, title="Nueva Conversación", created_at=ts, updated_at=ts
+        )
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[SessionRecord.id],
+                set_={
+                    "updated_at": stmt.excluded.updated_at,
+                    "title": func.coalesce(SessionRecord.title, stmt.excluded.title),
+                },
+            )
+        )
     else:
-        existing.updated_at = _utcnow()
-        if existing.title is None:
-            existing.title = "Nueva Conversación"
+        existing = db.get(SessionRecord, session_id)
+        if existing is None:
+            db.add(SessionRecord(id=session_id))
+        else:
+            existing.updated_at = _utcnow()
+            if existing.title is None:
+                existing.title = "Nueva Conversación"
+    _known_sessions[session_id] = now
+
+
+def forget_session(session_id: str) -> None:
+    """Drops a session from the _ensure_session cache (call after deleting its row)."""
+    _known_sessions.pop(session_id, None)
+
+
+def _enqueue_write(model: type, row: dict[str, Any]) -> None:
+    global _flusher
+    with _pending_lock:
+        _pending_writes.append((model, row))
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="persistence-writer", daemon=True)
+            _flusher.start()
+    if _write_error is not None:
+        # The writer keeps failing: flush here so the caller gets the error
+        # (the row stays buffered and is retried)
+        flush_pending_writes()
+        return
+    _flush_event.set()
+
+
+def _retry_delay(failures: int) -> float:
+    return min(_WRITE_RETRY_BASE * 2 ** (failures - 1), _WRITE_RETRY_MAX)
+
+
+def _flush_loop() -> None:
+    global _write_error
+    failures = 0
+    while True:
+        if failures:
+            time.sleep(_retry_delay(failures))
+        else:
+            _flush_event.wait()
+            _flush_event.clear()
+            deadline = time.monotonic() + _WRITE_FLUSH_INTERVAL
+            while len(_pending_writes) < _WRITE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _flush_event.wait(remaining)
+                _flush_event.clear()
+        try:
+            flush_pending_writes()
+        except Exception as exc:
+            failures += 1
+            if failures == _WRITE_MAX_RETRIES:
+                logger.error(
+                    "Persistence writes failing after %d attempts (%d rows buffered): %s",
+                    failures, len(_pending_writes), exc,
+                )
+                _write_error = exc
+            else:
+                logger.warning("Buffered persistence write failed (attempt %d), retrying: %s", failures, exc)
+            continue
+        if failures:
+            logger.info("Buffered persistence writes recovered after %d failed attempts", failures)
+        failures = 0
+
+
+def _flush_quietly() -> None:
+    # A failed flush must not break the reader that triggered it
+    try:
+        flush_pending_writes()
+    except Exception:
+        logger.exception("Failed to flush buffered persistence writes")
+
+
+def _drain_pending_writes() -> None:
+    """Flushes the buffer at shutdown, retrying with backoff before giving up."""
+    for attempt in range(1, _WRITE_MAX_RETRIES + 1):
+        try:
+            flush_pending_writes()
+            return
+        except Exception:
+            if attempt == _WRITE_MAX_RETRIES:
+                logger.exception("Dropping %d buffered persistence writes at shutdown", len(_pending_writes))
+                return
+            time.sleep(_retry_delay(attempt))
+
+
+def _insert_rows(rows: list[tuple[type, dict[str, Any]]]) -> None:
+    """Inserts buffered rows (and touches their sessions) in one transaction."""
+    session_ids = list(dict.fromkeys(row["session_id"] for _, row in rows))
+    session = _get_session()
+    try:
+        for sid in session_ids:
+            _ensure_session(session, sid)
+        session.flush()
+        messages = [row for model, row in rows if model is ChatMessage]
+        tool_calls = [row for model, row in rows if model is ToolCall]
+        if messages:
+            session.bulk_insert_mappings(ChatMessage, messages)
+        if tool_calls:
+            session.bulk_insert_mappings(ToolCall, tool_calls)
+        session.commit()
+    except Exception:
+        session.rollback()
+        for sid in session_ids:
+            forget_session(sid)
+        raise
+    finally:
+        session.close()
+
+
+def _requeue(rows: list[tuple[type, dict[str, Any]]]) -> None:
+    with _pending_lock:
+        _pending_writes[:0] = rows
+
+
+def flush_pending_writes() -> None:
+    """
+    Writes every buffered chat message / tool call in one transaction.
+
+    On a transient database error (locked, disconnected) the batch goes back to the
+    front of the buffer and the error is raised. Any other error is retried row by
+    row, so a single bad row is logged and dropped without holding back the rest.
+    """
+    global _write_error
+    # Even with an empty buffer, wait for a flush in progress (the writer takes the
+    # lock before emptying the buffer), or the reader would miss those rows.
+    if not _pending_writes and not _flush_lock.locked():
+        return
+    with _flush_lock:
+        with _pending_lock:
+            batch = list(_pending_writes)
+            _pending_writes.clear()
+        if not batch:
+            return
+        try:
+            _insert_rows(batch)
+        except _TRANSIENT_WRITE_ERRORS:
+            _requeue(batch)
+            raise
+        except Exception as exc:
+            if len(batch) > 1:
+                logger.warning("Buffered write batch of %d rows failed, retrying row by row: %s", len(batch), exc)
+            for index, item in enumerate(batch):
+                try:
+                    _insert_rows([item])
+                except _TRANSIENT_WRITE_ERRORS:
+                    _requeue(batch[index:])
+                    raise
+                except Exception as row_exc:
+                    model, row = item
+                    logger.error(
+                        "Dropping buffered %s row for session %s: %s",
+                        model.__tablename__, row["session_id"], row_exc,
+                    )
+        _write_error = None
+
+
+atexit.register(_drain_pending_writes)
+
+
+# Dedicated pool for blocking DB reads issued from async code, so they don't
+# compete with other work on the loop's default executor.
+_PERSIST_WORKERS = 4
+_persist_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_persist_executor() -> ThreadPoolExecutor:
+    global _persist_executor
+    if _persist_executor is None:
+        _persist_executor = ThreadPoolExecutor(
+            max_workers=_PERSIST_WORKERS, thread_name_prefix="navibot-persist"
+        )
+    return _persist_executor
+
+
+async def run_persistence(func, *args, **kwargs):
+    """Runs a blocking persistence call on the dedicated executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_persist_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_persistence() -> None:
+    """Drains buffered writes and stops the persistence executor."""
+    global _persist_executor
+    _drain_pending_writes()
+    if _persist_executor is not None:
+        _persist_executor.shutdown(wait=True)
+        _persist_executor = None
 
 
 def _to_json(value: Any) -> Optional[str]:
     if value is None:
         return None
     try:
-        return json.dumps(value, ensure_ascii=False, default=str)
+        return _dumps(value)
     except Exception:
-        return json.dumps(str(value), ensure_ascii=False)
+        return _dumps(str(value))
+
+
+def _result_to_json(value: Any) -> Optional[str]:
+    # Many tools already return JSON text: store it as is instead of encoding
+    # it again as an escaped JSON string.
+    if type(value) is str and value[:1] in ("{", "["):
+        try:
+            _loads(value)
+            return value
+        except Exception:
+            pass
+    return _to_json(value)
 
 
 def get_app_setting(key: str) -> Any:
@@ -202,17 +526,24 @@ def save_chat_message(session_id: str, role: str, content: Any) -> None:
     """
     Saves a chat message. 
     Content can be a string (legacy) or a Pydantic model/dict (serialized to JSON).
+    Without a session_id there is nothing to attach it to, so it is not stored.
+    While buffered writes keep failing, the database error is raised here.
     """
+    if not session_id:
+        return
     if hasattr(content, "model_dump_json"):
-        content_str = content.model_dump_json()
+        # Without the None fields: a google-genai Part serialises ~15 null keys per
+        # part, which every history load would then have to parse again.
+        content_str = content.model_dump_json(exclude_none=True)
     elif isinstance(content, (dict, list)):
-        content_str = json.dumps(content, ensure_ascii=False, default=str)
+        content_str = _dumps(content)
     else:
         content_str = str(content)
 
-    with db_session() as db:
-        _ensure_session(db, session_id)
-        db.add(ChatMessage(session_id=session_id, role=role, content=content_str))
+    _enqueue_write(
+        ChatMessage,
+        {"session_id": session_id, "role": role, "content": content_str, "created_at": _utcnow()},
+    )
 
 
 def save_tool_call(
@@ -223,132 +554,148 @@ def save_tool_call(
     result: Any,
     error: Optional[str],
 ) -> None:
+    if not session_id:
+        return
     payload = {"args": list(args), "kwargs": kwargs}
-    with db_session() as db:
-        _ensure_session(db, session_id)
-        db.add(
-            ToolCall(
-                session_id=session_id,
-                tool_name=tool_name,
-                args_json=_to_json(payload),
-                result_json=_to_json(result),
-                error=error,
-            )
-        )
+    _enqueue_write(
+        ToolCall,
+        {
+            "session_id": session_id,
+            "tool_name": tool_name,
+            "args_json": _to_json(payload),
+            "result_json": _result_to_json(result),
+            "error": error,
+            "created_at": _utcnow(),
+        },
+    )
+
+
+def _history_entry(role_column: str, content: str) -> dict[str, Any]:
+    if role_column == "assistant" or role_column == "model":
+        role = "model"
+    else:
+        role = "user"
 
+    # Only a JSON object can be a Content with "parts"; legacy text (or any other
+    # JSON) ends up in the same fallback, so it is not even parsed.
+    if type(content) is str and content.lstrip()[:1] != "{":
+        return {"role": role, "parts": [{"text": content}]}
 
-def load_chat_history(session_id: str, limit: int = 200) -> list[dict[str, Any]]:
+    try:
+        # Try to parse as JSON first (new format)
+        data = _loads(content)
+        if isinstance(data, dict) and "parts" in data:
+            # It's a full Gemini content object
+            # Ensure role matches mapped role or use stored role?
+            # Gemini SDK expects 'role' and 'parts'.
+            # Our DB stores 'assistant'/'user' in role column, but Gemini uses 'model'/'user'.
+            # If the JSON has 'role', we can trust it, but we should probably normalize to 'model' if it says 'assistant'.
+
+            # If we saved it from Gemini SDK, it has 'model' or 'user'.
+            return data
+        # Fallback for simple JSON or unexpected structure
+        return {"role": role, "parts": [{"text": content}]}
+    except (json.JSONDecodeError, TypeError):
+        # Legacy text format
+        return {"role": role, "parts": [{"text": content}]}
+
+
+_HISTORY_YIELD_PER = 50
+
+
+def iter_chat_history(session_id: str, limit: int = 200) -> Iterator[dict[str, Any]]:
+    """Yields history entries oldest-first, fetching rows in chunks of _HISTORY_YIELD_PER."""
     with db_session() as db:
-        rows = (
-            db.query(ChatMessage)
-            .filter(ChatMessage.session_id == session_id)
+        rows = db.execute(
+            select(ChatMessage.role, ChatMessage.content)
+            .where(ChatMessage.session_id == session_id)
             .order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
             .limit(limit)
-            .all()
+            .execution_options(yield_per=_HISTORY_YIELD_PER)
         )
-    history = []
-    for row in rows:
-        if row.role == "assistant" or row.role == "model":
-            role = "model"
-        else:
-            role = "user"
-            
-        try:
-            # Try to parse as JSON first (new format)
-            data = json.loads(row.content)
-            if isinstance(data, dict) and "parts" in data:
-                # It's a full Gemini content object
-                # Ensure role matches mapped role or use stored role?
-                # Gemini SDK expects 'role' and 'parts'.
-                # Our DB stores 'assistant'/'user' in role column, but Gemini uses 'model'/'user'.
-                # If the JSON has 'role', we can trust it, but we should probably normalize to 'model' if it says 'assistant'.
-                
-                # If we saved it from Gemini SDK, it has 'model' or 'user'.
-                history.append(data)
-            else:
-                # Fallback for simple JSON or unexpected structure
-                history.append({"role": role, "parts": [{"text": row.content}]})
-        except (json.JSONDecodeError, TypeError):
-            # Legacy text format
-            history.append({"role": role, "parts": [{"text": row.content}]})
-            
-    return history
+        for role, content in rows:
+            yield _history_entry(role, content)
+
+
+def load_chat_history(session_id: str, limit: int = 200) -> list[dict[str, Any]]:
+    return list(iter_chat_history(session_id, limit))
 
 
 def _safe_json_loads(value: str) -> Any:
     try:
-        return json.loads(value)
+        return _loads(value)
     except Exception:
         return None
 
 
+def _label_payload(label: str, payload: Any) -> str:
+    if payload is None:
+        return label
+    try:
+        return f"{label} {_dumps(payload)}"
+    except Exception:
+        return f"{label} {payload}"
+
+
 def _extract_text_from_parts(parts: Any) -> str:
-    if not isinstance(parts, list):
+    # Fresh out of _loads: exact list/dict types, so a type() is check is enough
+    if type(parts) is not list:
         return ""
     out: list[str] = []
+    append = out.append
     for part in parts:
-        if not isinstance(part, dict):
-            continue
-        text = part.get("text")
-        if isinstance(text, str) and text:
-            out.append(text)
+        if type(part) is not dict:
             continue
-        function_call = part.get("function_call")
-        if isinstance(function_call, dict) and function_call:
-            name = function_call.get("name")
-            args = function_call.get("args")
-            label = f"[tool_call] {name}" if name else "[tool_call]"
-            if args is not None:
-                try:
-                    out.append(f"{label} {json.dumps(args, ensure_ascii=False, default=str)}")
-                except Exception:
-                    out.append(f"{label} {str(args)}")
-            else:
-                out.append(label)
+        get = part.get
+        text = get("text")
+        if text and type(text) is str:
+            append(text)
             continue
-        function_response = part.get("function_response")
-        if isinstance(function_response, dict) and function_response:
-            name = function_response.get("name")
-            response = function_response.get("response")
-            label = f"[tool_result] {name}" if name else "[tool_result]"
-            if response is not None:
-                try:
-                    out.append(f"{label} {json.dumps(response, ensure_ascii=False, default=str)}")
-                except Exception:
-                    out.append(f"{label} {str(response)}")
-            else:
-                out.append(label)
+        call = get("function_call")
+        if call and type(call) is dict:
+            name = call.get("name")
+            append(_label_payload(f"[tool_call] {name}" if name else "[tool_call]", call.get("args")))
             continue
-    return "\n".join(out).strip()
+        response = get("function_response")
+        if response and type(response) is dict:
+            name = response.get("name")
+            append(_label_payload(f"[tool_result] {name}" if name else "[tool_result]", response.get("response")))
+    return "\n".join(out).strip() if out else ""
 
 
-def _normalize_chat_row(row: ChatMessage) -> dict[str, Any]:
-    if row.role in ("assistant", "model"):
-        role = "assistant"
-    else:
-        role = "user"
+_PAGE_COLUMNS = (
+    ChatMessage.id,
+    ChatMessage.session_id,
+    ChatMessage.role,
+    ChatMessage.content,
+    ChatMessage.created_at,
+)
 
-    parsed = _safe_json_loads(row.content)
-    corrupted = False
-    raw: Any = None
-    text: str = ""
 
+def _parse_content(content: str) -> tuple[Any, Optional[str], str, bool]:
+    """
+    Parses a stored message: returns (raw, role from the payload, display text, corrupted).
+    raw is a fresh object owned by the caller.
+    """
+    parsed = _safe_json_loads(content)
     if isinstance(parsed, dict) and "parts" in parsed:
-        raw = parsed
-        raw_role = parsed.get("role")
-        if raw_role in ("assistant", "model"):
-            role = "assistant"
-        elif raw_role == "user":
-            role = "user"
-        text = _extract_text_from_parts(parsed.get("parts")) or ""
-    elif parsed is not None:
-        raw = parsed
-        text = str(parsed)
+        return parsed, parsed.get("role"), _extract_text_from_parts(parsed.get("parts")) or "", False
+    if parsed is not None:
+        return parsed, None, str(parsed), False
+    return None, None, content, bool(content) and content.lstrip().startswith("{")
+
+
+def _normalize_chat_row(row: Row) -> dict[str, Any]:
+    raw, raw_role, text, corrupted = _parse_content(row.content)
+
+    if raw_role in ("assistant", "model"):
+        role = "assistant"
+    elif raw_role == "user":
+        role = "user"
+    elif row.role in ("assistant", "model"):
+        role = "assistant"
     else:
-        raw = None
-        text = row.content
-        if row.content and row.content.lstrip().startswith("{"):
-            corrupted = True
+        role = "user"
 
     return {
         "id": row.id,
@@ -372,10 +719,10 @@ def load_chat_messages_page(
         limit = 200
 
     with db_session() as db:
-        q = db.query(ChatMessage).filter(ChatMessage.session_id == session_id)
+        stmt = select(*_PAGE_COLUMNS).where(ChatMessage.session_id == session_id)
         if before_id is not None:
-            q = q.filter(ChatMessage.id < before_id)
-        rows = q.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+            stmt = stmt.where(ChatMessage.id < before_id)
+        rows = db.execute(stmt.order_by(ChatMessage.id.desc()).limit(limit + 1)).all()
 
     has_more = len(rows) > limit
     rows = rows[:limit]
@@ -396,28 +743,33 @@ def wrap_tool(tool):
     if getattr(tool, "_navibot_wrapped", False):
         return tool
     is_async = asyncio.iscoroutinefunction(tool)
+    tool_name = tool.__name__
 
     if is_async:
         @functools.wraps(tool)
         async def wrapped(*args, **kwargs):
             session_id = get_session_id()
+            if not session_id:
+                return await tool(*args, **kwargs)
             try:
                 result = await tool(*args, **kwargs)
-                save_tool_call(session_id, tool.__name__, args, kwargs, result, None)
+                save_tool_call(session_id, tool_name, args, kwargs, result, None)
                 return result
             except Exception as e:
-                save_tool_call(session_id, tool.__name__, args, kwargs, None, str(e))
+                save_tool_call(session_id, tool_name, args, kwargs, None, str(e))
                 raise
     else:
         @functools.wraps(tool)
         def wrapped(*args, **kwargs):
             session_id = get_session_id()
+            if not session_id:
+                return tool(*args, **kwargs)
             try:
                 result = tool(*args, **kwargs)
-                save_tool_call(session_id, tool.__name__, args, kwargs, result, None)
+                save_tool_call(session_id, tool_name, args, kwargs, result, None)
                 return result
             except Exception as e:
-                save_tool_call(session_id, tool.__name__, args, kwargs, None, str(e))
+                save_tool_call(session_id, tool_name, args, kwargs, None, str(e))
                 raise
 
     wrapped._navibot_wrapped = True
@@ -1,68 +1,163 @@
 import asyncio
 import functools
 import inspect
-from app.core.runtime_context import get_session_id
+from typing import Any, Callable, NamedTuple, Optional
+from app.core.runtime_context import get_session_id, note_tool_output
 from app.core.persistence import save_tool_call
 
-def wrap_tool(tool):
-    if getattr(tool, "_navibot_wrapped", False):
-        return tool
-    
+_SLOW_KINDS = (
+    inspect.Parameter.POSITIONAL_ONLY,
+    inspect.Parameter.VAR_POSITIONAL,
+    inspect.Parameter.VAR_KEYWORD,
+)
+
+
+def _make_binder(func):
+    """
+    Returns bind(args, kwargs) -> dict of named arguments with defaults applied,
+    equivalent to sig.bind(...).apply_defaults() but without per-call introspection.
+    """
+    sig = inspect.signature(func)
+
+    def bind_slow(args, kwargs):
+        bound = sig.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return dict(bound.arguments)
+
+    params = sig.parameters
+    if any(p.kind in _SLOW_KINDS for p in params.values()):
+        return bind_slow
+
+    positional = tuple(
+        name for name, p in params.items() if p.kind is inspect.Parameter.POSITIONAL_OR_KEYWORD
+    )
+    defaults = {name: p.default for name, p in params.items() if p.default is not inspect.Parameter.empty}
+    n_params = len(params)
+
+    def bind(args, kwargs):
+        if len(args) > len(positional):
+            return bind_slow(args, kwargs)
+        tool_input = dict(defaults)
+        tool_input.update(zip(positional, args))
+        for name, value in kwargs.items():
+            if name not in params or name in positional[:len(args)]:
+                return bind_slow(args, kwargs)
+            tool_input[name] = value
+        if len(tool_input) != n_params:
+            # A required argument is missing: let sig.bind raise its TypeError
+            return bind_slow(args, kwargs)
+        return tool_input
+
+    return bind
+
+
+class _ToolMeta(NamedTuple):
+    is_async: bool
+    is_structured: bool
+    name: str
+    metadata_source: Any
+    # tool.arun / tool.run of a StructuredTool, or None to call the tool directly
+    runner: Optional[Callable]
+
+
+def _inspect_tool(tool) -> _ToolMeta:
+    """Runs every attribute probe wrap_tool needs, once per tool."""
     # Determine if it's a LangChain StructuredTool and extract metadata source
     metadata_source = tool
     is_async = asyncio.iscoroutinefunction(tool)
-    is_structured_tool = hasattr(tool, "args_schema") and (hasattr(tool, "func") or hasattr(tool, "coroutine"))
-    
-    if is_structured_tool:
-        if hasattr(tool, "coroutine") and tool.coroutine:
-            metadata_source = tool.coroutine
+    is_structured = hasattr(tool, "args_schema") and (hasattr(tool, "func") or hasattr(tool, "coroutine"))
+    if not is_structured:
+        return _ToolMeta(is_async, False, tool.__name__, metadata_source, None)
+
+    coroutine = getattr(tool, "coroutine", None)
+    func = getattr(tool, "func", None)
+    if coroutine:
+        metadata_source = coroutine
+        is_async = True
+    elif func:
+        metadata_source = func
+        if asyncio.iscoroutinefunction(metadata_source):
             is_async = True
-        elif hasattr(tool, "func") and tool.func:
-            metadata_source = tool.func
-            if asyncio.iscoroutinefunction(metadata_source):
-                is_async = True
+    runner = getattr(tool, "arun" if is_async else "run", None)
+    return _ToolMeta(is_async, True, tool.name, metadata_source, runner)
+
 
-    if is_async:
+def wrap_tool(tool):
+    if getattr(tool, "_navibot_wrapped", False):
+        return tool
+
+    is_async, _, tool_name, metadata_source, runner = _inspect_tool(tool)
+    bind_args = _make_binder(metadata_source) if runner is not None else None
+
+    # One variant per shape (async/sync x StructuredTool/callable), so the body
+    # of each call makes no decisions at run time.
+    if is_async and runner is not None:
+        @functools.wraps(metadata_source)
+        async def wrapped(*args, **kwargs):
+            session_id = get_session_id()
+            if not session_id:
+                result = await runner(bind_args(args, kwargs))
+                note_tool_output(result)
+                return result
+            try:
+                # Use arun for async StructuredTools
+                # Convert args/kwargs to dict using signature to support positional args
+                result = await runner(bind_args(args, kwargs))
+                note_tool_output(result)
+                save_tool_call(session_id, tool_name, args, kwargs, result, None)
+                return result
+            except Exception as e:
+                save_tool_call(session_id, tool_name, args, kwargs, None, str(e))
+                raise
+    elif is_async:
         @functools.wraps(metadata_source)
         async def wrapped(*args, **kwargs):
             session_id = get_session_id()
+            if not session_id:
+                result = await tool(*args, **kwargs)
+                note_tool_output(result)
+                return result
+            try:
+                result = await tool(*args, **kwargs)
+                note_tool_output(result)
+                save_tool_call(session_id, tool_name, args, kwargs, result, None)
+                return result
+            except Exception as e:
+                save_tool_call(session_id, tool_name, args, kwargs, None, str(e))
+                raise
+    elif runner is not None:
+        @functools.wraps(metadata_source)
+        def wrapped(*args, **kwargs):
+            session_id = get_session_id()
+            if not session_id:
+                result = runner(bind_args(args, kwargs))
+                note_tool_output(result)
+                return result
             try:
-                if is_structured_tool and hasattr(tool, "arun"):
-                    # Use arun for async StructuredTools
-                    # Convert args/kwargs to dict using signature to support positional args
-                    sig = inspect.signature(metadata_source)
-                    bound = sig.bind(*args, **kwargs)
-                    bound.apply_defaults()
-                    tool_input = bound.arguments
-                    result = await tool.arun(tool_input)
-                else:
-                    result = await tool(*args, **kwargs)
-                
-                save_tool_call(session_id, tool.name if is_structured_tool else tool.__name__, args, kwargs, result, None)
+                # Use run for sync StructuredTools
+                # Convert args/kwargs to dict using signature to support positional args
+                result = runner(bind_args(args, kwargs))
+                note_tool_output(result)
+                save_tool_call(session_id, tool_name, args, kwargs, result, None)
                 return result
             except Exception as e:
-                save_tool_call(session_id, tool.name if is_structured_tool else tool.__name__, args, kwargs, None, str(e))
+                save_tool_call(session_id, tool_name, args, kwargs, None, str(e))
                 raise
     else:
         @functools.wraps(metadata_source)
         def wrapped(*args, **kwargs):
             session_id = get_session_id()
+            if not session_id:
+                result = tool(*args, **kwargs)
+                note_tool_output(result)
+                return result
             try:
-                if is_structured_tool and hasattr(tool, "run"):
-                     # Use run for sync StructuredTools
-                     # Convert args/kwargs to dict using signature to support positional args
-                     sig = inspect.signature(metadata_source)
-                     bound = sig.bind(*args, **kwargs)
-                     bound.apply_defaults()
-                     tool_input = bound.arguments
-                     result = tool.run(tool_input)
-                else:
-                    result = tool(*args, **kwargs)
-                
-                save_tool_call(session_id, tool.name if is_structured_tool else tool.__name__, args, kwargs, result, None)
+                result = tool(*args, **kwargs)
+                note_tool_output(result)
+                save_tool_call(session_id, tool_name, args, kwargs, result, None)
                 return result
             except Exception as e:
-                save_tool_call(session_id, tool.name if is_structured_tool else tool.__name__, args, kwargs, None, str(e))
+                save_tool_call(session_id, tool_name, args, kwargs, None, str(e))
                 raise
 
     wrapped._navibot_wrapped = True
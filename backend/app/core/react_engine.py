@@ -6,10 +6,47 @@ The agent iteratively reasons, acts, observes results, and reflects until the ta
 """
 
 import asyncio
+import logging
+import re
 import time
-from typing import Dict, Any, List, Optional, Callable
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Any, List, Optional, Callable
 from datetime import datetime
 
+from app.core.runtime_context import (
+    pop_collected_artifacts,
+    reset_artifact_collection,
+    start_artifact_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+_ARTIFACT_RE = re.compile(r"\[FILE_ARTIFACT:\s*(.+?)\]")
+# Cap on entries kept in reasoning_trace / tool_calls_history (oldest are dropped)
+_TRACE_MAXLEN = 1024
+
+# Observation formatter by exact result type; anything else falls back to "Observation: ..."
+_OBS_FORMATTERS = {
+    dict: lambda r: f"Tool execution result: {r}",
+    str: lambda r: f"Observation: {r}",
+}
+
+# Eager task factory (Python 3.12+), used only for event delivery
+_eager_task = getattr(asyncio, "eager_task_factory", None)
+
+# Last per-second stamp for _log_trace: [epoch_sec, "HH:MM:SS"]
+_LAST_SEC: list = [0, ""]
+
+
+def _trace_timestamp() -> str:
+    """HH:MM:SS.mmm; the strftime part is only recomputed when the second changes."""
+    now = time.time()
+    sec = int(now)
+    if sec != _LAST_SEC[0]:
+        _LAST_SEC[:] = [sec, time.strftime("%H:%M:%S", time.localtime(sec))]
+    return f"{_LAST_SEC[1]}.{int((now - sec) * 1000):03d}"
+
 
 class ReActLoop:
     """
@@ -29,7 +66,8 @@ class ReActLoop:
         session_id: str = "default",
         max_iterations: int = 10,
         timeout_seconds: int = 300,
-        event_callback: Optional[Callable] = None
+        event_callback: Optional[Callable] = None,
+        manual_tool_loop: bool = False
     ):
         """
         Initialize ReAct loop.
@@ -40,18 +78,28 @@ class ReActLoop:
             max_iterations: Maximum number of reasoning iterations
             timeout_seconds: Maximum execution time in seconds
             event_callback: Optional async callback for streaming events
+            manual_tool_loop: Keep iterating up to max_iterations (for manual tool
+                handling); otherwise a single cycle, since the SDK runs the tools
         """
         self.agent = agent
         self.session_id = session_id
         self.max_iterations = max_iterations
         self.timeout_seconds = timeout_seconds
         self.event_callback = event_callback
+        self.manual_tool_loop = manual_tool_loop
+        # Without a subscriber not even a coroutine is created per event
+        self._has_callback = event_callback is not None
+        # Events held back while a batched_events() block is open
+        self._event_batch: Optional[List[tuple]] = None
+        # Deliveries in flight; execute() waits for them before returning
+        self._pending_events: set = set()
+        self._last_delivery: Optional[asyncio.Task] = None
         
         # Execution state
         self.iterations = 0
         self.start_time = None
-        self.tool_calls_history: List[Dict[str, Any]] = []
-        self.reasoning_trace: List[str] = []
+        self.tool_calls_history: Deque[Dict[str, Any]] = deque(maxlen=_TRACE_MAXLEN)
+        self.reasoning_trace: Deque[str] = deque(maxlen=_TRACE_MAXLEN)
         
     async def execute(self, initial_prompt: str) -> Dict[str, Any]:
         """
@@ -65,19 +113,20 @@ class ReActLoop:
                 - response: Final agent response
                 - iterations: Number of iterations executed
                 - tool_calls: List of all tool calls made
-                - reasoning_trace: List of reasoning steps
+                - reasoning_trace: List of reasoning steps (the most recent 1024)
                 - termination_reason: Why the loop ended
         """
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
         self.iterations = 0
-        self.tool_calls_history = []
-        self.reasoning_trace = []
+        self.tool_calls_history = deque(maxlen=_TRACE_MAXLEN)
+        self.reasoning_trace = deque(maxlen=_TRACE_MAXLEN)
         
         # Emit start event
-        await self._emit_event("start", {
-            "message": initial_prompt,
-            "max_iterations": self.max_iterations
-        })
+        if self._has_callback:
+            self._emit_event("start", {
+                "message": initial_prompt,
+                "max_iterations": self.max_iterations
+            })
         
         # Start chat session
         from app.core.runtime_context import get_session_id
@@ -89,7 +138,10 @@ class ReActLoop:
         
         self._log_trace(f"[INITIAL PROMPT] {initial_prompt}")
         
-        while self.iterations < self.max_iterations:
+        # With automatic_function_calling the SDK runs the tools inside
+        # send_message, so every cycle ends on its first iteration.
+        iteration_cap = self.max_iterations if self.manual_tool_loop else min(self.max_iterations, 1)
+        while self.iterations < iteration_cap:
             self.iterations += 1
             
             # Check timeout
@@ -97,28 +149,36 @@ class ReActLoop:
                 termination_reason = "timeout"
                 final_response = f"Task execution timed out after {self.timeout_seconds} seconds. Completed {self.iterations} iterations."
                 self._log_trace(f"[TIMEOUT] Execution exceeded {self.timeout_seconds}s")
-                await self._emit_event("error", {
-                    "message": "Execution timeout",
-                    "details": final_response
-                })
+                if self._has_callback:
+                    self._emit_event("error", {
+                        "message": "Execution timeout",
+                        "details": final_response
+                    })
                 break
             
             self._log_trace(f"\n[ITERATION {self.iterations}] Starting reasoning cycle")
             
-            # Emit iteration start event
-            await self._emit_event("iteration_start", {
-                "iteration": self.iterations,
-                "max_iterations": self.max_iterations
-            })
-            
-            # Emit thinking event
-            await self._emit_event("thinking", {
-                "message": f"Processing iteration {self.iterations} of {self.max_iterations}..."
-            })
+            # Emit iteration start + thinking from one delivery task, before the model call
+            if self._has_callback:
+                # Same instant for the whole burst: one isoformat() per iteration
+                iter_ts = datetime.now().isoformat()
+                with self.batched_events():
+                    self._emit_event("iteration_start", {
+                        "iteration": self.iterations,
+                        "max_iterations": self.max_iterations
+                    }, ts=iter_ts)
+                    self._emit_event("thinking", {
+                        "message": f"Processing iteration {self.iterations} of {self.max_iterations}..."
+                    }, ts=iter_ts)
             
             try:
                 # Send message to agent
-                response_obj = await self.agent.send_message(current_prompt, session_id=self.session_id)
+                artifacts_token = start_artifact_collection()
+                try:
+                    response_obj = await self.agent.send_message(current_prompt, session_id=self.session_id)
+                finally:
+                    produced_artifacts = pop_collected_artifacts()
+                    reset_artifact_collection(artifacts_token)
                 
                 # Extract text and handle non-text responses (e.g. function calls)
                 response_text = ""
@@ -135,10 +195,11 @@ class ReActLoop:
                 # Inspect parts for function calls or other content if text is empty
                 if not response_text:
                     try:
-                        if hasattr(response_obj, 'candidates') and response_obj.candidates:
-                            for part in response_obj.candidates[0].content.parts:
-                                if part.function_call:
-                                    fc = part.function_call
+                        candidates = getattr(response_obj, 'candidates', None)
+                        if candidates:
+                            for part in candidates[0].content.parts or ():
+                                fc = getattr(part, 'function_call', None)
+                                if fc:
                                     tool_calls_info.append(f"{fc.name}({fc.args})")
                     except Exception as e:
                         self._log_trace(f"[WARNING] Error inspecting response parts: {e}")
@@ -153,109 +214,26 @@ class ReActLoop:
                     response_text = "No response text generated (Action completed without output)."
                 
                 # --- AUTO-INJECT MISSING ARTIFACTS (VALIDATION LAYER) ---
-                # Check if we generated artifacts in this turn but forgot to include them in the final text
-                generated_artifacts = []
-                # Scan tool calls for artifacts
-                if hasattr(response_obj, 'candidates') and response_obj.candidates:
-                    for part in response_obj.candidates[0].content.parts:
-                        if part.function_call:
-                             # This is where we would check the *result* of the function call if we had it here.
-                             # But in this loop, we are receiving the model's *request* to call a tool (if manual) 
-                             # OR the model's response *after* tool execution (if automatic).
-                             # With 'automatic_function_calling', the response_obj contains the final text AFTER tools run.
-                             # However, we don't easily see the tool outputs here unless we look at the history or if the SDK provides them.
-                             
-                             # Wait, with automatic_function_calling, the 'response_obj' is the FINAL response.
-                             # The intermediate tool calls happened behind the scenes in the SDK.
-                             # The SDK unfortunately hides the intermediate tool outputs (like "[FILE_ARTIFACT...]") from the final response object structure usually.
-                             # UNLESS we use the 'history' or if the model decided to repeat it.
-                             
-                             # Actually, in the current Google GenAI SDK with automatic_function_calling, 
-                             # getting the tool outputs that happened is tricky without a custom loop.
-                             # But let's assume for a moment we can't easily see "past" tool outputs in this object.
-                             
-                             # ALTERNATIVE: The tools themselves (browser.py) return strings.
-                             # If the model uses the tool, the *result* is fed back to the model.
-                             # The model *should* see "[FILE_ARTIFACT...]" in its context.
-                             # If the model ignores it, we want to force it.
-                             pass
-
-                # Since we can't easily intercept the tool output in the automatic loop from the 'response_obj' alone 
-                # (without inspecting the chat session history which might be updated),
-                # we will rely on a simpler heuristic or just trust the prompt for now, 
-                # OR we switch to manual tool execution if we want strict control.
-                
-                # However, to strictly follow the plan "Update react_engine.py to auto-inject", 
-                # we need access to the tool outputs. 
-                # Let's inspect the chat history to find the latest tool response.
-                
-                try:
-                    # Access the chat session history
-                    history = self.agent._chat_session.get_history()
-                    # Look at the last few messages. 
-                    # We expect: Model(FunctionCall) -> User(FunctionResponse) -> Model(FinalText)
-                    # The FunctionResponse part contains the tool output.
-                    
-                    if len(history) >= 2:
-                        last_user_message = history[-2] # The one before the final model response?
-                        # Actually, history structure depends on the SDK.
-                        # Usually it's [User, Model, User(ToolOutput), Model]
-                        
-                        # Iterate backwards to find recent tool outputs in this "turn"
-                        # Since we don't know exactly how many turns happened in one send_message call (automatic),
-                        # we can just look for tool outputs that are NOT present in the final response text.
-                        
-                        for msg in reversed(history):
-                            if msg.role == "user" and msg.parts: # Tool outputs are often treated as 'user' role or 'function' role depending on API version
-                                for part in msg.parts:
-                                    # Check for function_response
-                                    if hasattr(part, 'function_response'):
-                                        # This is a tool output!
-                                        # The content is usually in the 'response' field of the function_response
-                                        # But the SDK might wrap it. 
-                                        # Let's try to stringify or access it.
-                                        result_content = str(part.function_response) 
-                                        # This might need refinement depending on exact object structure
-                                        # But let's look for our tag regex in the string representation
-                                        
-                                        import re
-                                        matches = re.findall(r"\[FILE_ARTIFACT:\s*(.+?)\]", result_content)
-                                        for match in matches:
-                                            artifact_tag = f"[FILE_ARTIFACT: {match}]"
-                                            if artifact_tag not in response_text:
-                                                generated_artifacts.append(artifact_tag)
-                                    
-                                    # Also check plain text parts if the SDK puts tool output there
-                                    if hasattr(part, 'text') and part.text:
-                                        import re
-                                        matches = re.findall(r"\[FILE_ARTIFACT:\s*(.+?)\]", part.text)
-                                        for match in matches:
-                                            artifact_tag = f"[FILE_ARTIFACT: {match}]"
-                                            if artifact_tag not in response_text:
-                                                generated_artifacts.append(artifact_tag)
-                            
-                            # Stop if we hit a normal user message (not tool response)
-                            # This is hard to distinguish perfectly without more metadata, 
-                            # but we can limit to the last few messages.
-                            if msg.role == "user" and not any(hasattr(p, 'function_response') for p in msg.parts):
-                                break
-
+                # FILE_ARTIFACT tags returned by tools during this turn are recorded by the
+                # tool wrapper, so there's no need to dig them out of the SDK's chat history.
+                if produced_artifacts:
+                    # Tags the response already cites: O(1) lookup
+                    existing = set(_ARTIFACT_RE.findall(response_text))
+                    generated_artifacts = [
+                        f"[FILE_ARTIFACT: {path}]" for path in produced_artifacts if path not in existing
+                    ]
                     if generated_artifacts:
-                        # Deduplicate
-                        generated_artifacts = list(set(generated_artifacts))
                         response_text += "\n\n" + "\n".join(generated_artifacts)
                         self._log_trace(f"[AUTO-INJECTED ARTIFACTS] {generated_artifacts}")
 
-                except Exception as e:
-                    self._log_trace(f"[WARNING] Artifact injection check failed: {e}")
-
                 self._log_trace(f"[RESPONSE] {response_text}")
                 
                 # Emit response event
-                await self._emit_event("response", {
-                    "text": response_text,
-                    "iteration": self.iterations
-                })
+                if self._has_callback:
+                    self._emit_event("response", {
+                        "text": response_text,
+                        "iteration": self.iterations
+                    })
                 
                 # Check if this is a final answer (no tool calls needed)
                 # In the current implementation with automatic_function_calling=True,
@@ -275,10 +253,11 @@ class ReActLoop:
                 self._log_trace(f"[ERROR] {str(e)}")
                 final_response = f"Error during execution: {str(e)}"
                 termination_reason = "error"
-                await self._emit_event("error", {
-                    "message": "Execution error",
-                    "details": str(e)
-                })
+                if self._has_callback:
+                    self._emit_event("error", {
+                        "message": "Execution error",
+                        "details": str(e)
+                    })
                 break
         
         # Check if we hit max iterations
@@ -290,20 +269,25 @@ class ReActLoop:
                 last_trace = self.reasoning_trace[-1] if self.reasoning_trace else "No trace available"
                 final_response = f"⚠️ No pude completar la tarea en {self.max_iterations} pasos. Último estado: {last_trace}"
 
-        execution_time = time.time() - self.start_time
+        execution_time = time.monotonic() - self.start_time
         
         # Emit completion event
-        await self._emit_event("completion", {
-            "reason": termination_reason,
-            "iterations": self.iterations,
-            "execution_time_seconds": round(execution_time, 2)
-        })
+        if self._has_callback:
+            self._emit_event("completion", {
+                "reason": termination_reason,
+                "iterations": self.iterations,
+                "execution_time_seconds": round(execution_time, 2)
+            })
         
+        # Events are delivered in the background; don't return with deliveries pending
+        if self._pending_events:
+            await asyncio.gather(*self._pending_events, return_exceptions=True)
+
         return {
             "response": final_response or "No response generated",
             "iterations": self.iterations,
-            "tool_calls": self.tool_calls_history,
-            "reasoning_trace": self.reasoning_trace,
+            "tool_calls": list(self.tool_calls_history),
+            "reasoning_trace": list(self.reasoning_trace),
             "termination_reason": termination_reason,
             "execution_time_seconds": round(execution_time, 2)
         }
@@ -312,26 +296,75 @@ class ReActLoop:
         """Check if execution has exceeded timeout."""
         if self.start_time is None:
             return False
-        elapsed = time.time() - self.start_time
+        elapsed = time.monotonic() - self.start_time
         return elapsed > self.timeout_seconds
     
     def _log_trace(self, message: str):
         """Add a message to the reasoning trace."""
-        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        trace_entry = f"[{timestamp}] {message}"
+        trace_entry = f"[{_trace_timestamp()}] {message}"
         self.reasoning_trace.append(trace_entry)
-        print(trace_entry)  # Also print for real-time debugging
+        # Real-time debugging output is opt-in via the log level
+        logger.debug(trace_entry)
     
-    async def _emit_event(self, event_type: str, data: Dict[str, Any]):
-        """Emit an event to the callback if one is registered."""
+    def _emit_event(self, event_type: str, data: Dict[str, Any], ts: Optional[str] = None):
+        """
+        Emit an event to the callback if one is registered (without waiting for it).
+        `ts` lets events fired together share one precomputed ISO timestamp.
+        Every call site builds a fresh dict, so the timestamp is set in place.
+        """
         if self.event_callback:
-            try:
-                await self.event_callback(event_type, {
-                    **data,
-                    "timestamp": datetime.now().isoformat()
-                })
-            except Exception as e:
-                print(f"Error emitting event: {e}")
+            data["timestamp"] = ts or datetime.now().isoformat()
+            if self._event_batch is not None:
+                self._event_batch.append((event_type, data))
+                return
+            self._deliver([(event_type, data)])
+
+    def _deliver(self, batch: List[tuple]):
+        loop = asyncio.get_running_loop()
+        # Each delivery waits for the previous one, so the callback sees events in order
+        prev = self._last_delivery
+        if prev is not None and prev.done():
+            prev = None
+        coro = self._send_all(batch, prev)
+        # Only this task starts eagerly (3.12+): a callback that never suspends
+        # (e.g. a put on the SSE queue) finishes right here without a loop round trip
+        task = _eager_task(loop, coro) if _eager_task is not None else loop.create_task(coro)
+        if task.done():
+            self._last_delivery = None
+            return
+        self._last_delivery = task
+        self._pending_events.add(task)
+        task.add_done_callback(self._pending_events.discard)
+
+    async def _send(self, event_type: str, payload: Dict[str, Any]):
+        try:
+            await self.event_callback(event_type, payload)
+        except Exception as e:
+            logger.warning("Error emitting event %s: %s", event_type, e)
+
+    async def _send_all(self, batch: List[tuple], prev: Optional[asyncio.Task] = None):
+        if prev is not None:
+            await asyncio.wait((prev,))
+        for event_type, payload in batch:
+            await self._send(event_type, payload)
+
+    @contextmanager
+    def batched_events(self):
+        """
+        Holds back events emitted inside the block and delivers them in order
+        from a single task. Each event keeps its own type on the wire.
+        """
+        self._event_batch = []
+        try:
+            yield
+        finally:
+            self._flush_events()
+
+    def _flush_events(self):
+        batch, self._event_batch = self._event_batch, None
+        if not batch:
+            return
+        self._deliver(batch)
     
     def _extract_observations(self, tool_results: Any) -> str:
         """
@@ -340,9 +373,10 @@ class ReActLoop:
         This will be used in the advanced implementation where we manually
         handle tool calls and feed observations back to the agent.
         """
+        fn = _OBS_FORMATTERS.get(type(tool_results))
+        if fn is not None:
+            return fn(tool_results)
         if isinstance(tool_results, dict):
-            return f"Tool execution result: {tool_results}"
-        elif isinstance(tool_results, str):
-            return f"Observation: {tool_results}"
-        else:
-            return f"Observation: {str(tool_results)}"
+            # dict subclasses (OrderedDict, etc.) keep the dict format
+            return _OBS_FORMATTERS[dict](tool_results)
+        return f"Observation: {tool_results}"
@@ -2,10 +2,15 @@ from __future__ import annotations
 
 import asyncio
 import os
+import re
+import threading
 from contextvars import ContextVar
-from typing import Awaitable, Callable, Optional
+from types import MappingProxyType
+from typing import Awaitable, Callable, Mapping, Optional
 from enum import Enum
 
+from app.core.artifact_events import publish as _publish_artifact
+
 SessionId = str
 MemoryUserId = str
 EventCallback = Callable[[str, dict], Awaitable[None]]
@@ -19,10 +24,16 @@ class EntityType(Enum):
 
 _session_id_var: ContextVar[SessionId] = ContextVar("navibot_session_id", default="default")
 _memory_user_id_var: ContextVar[MemoryUserId] = ContextVar("navibot_memory_user_id", default="default")
-_event_callback_var: ContextVar[Optional[EventCallback]] = ContextVar("navibot_event_callback", default=None)
+# (callback, loop running when it was registered) so other threads can deliver to it
+_event_callback_var: ContextVar[Optional[tuple[EventCallback, Optional[asyncio.AbstractEventLoop]]]] = ContextVar("navibot_event_callback", default=None)
 _request_id_var: ContextVar[str] = ContextVar("navibot_request_id", default="")
 _entity_type_var: ContextVar[EntityType] = ContextVar("navibot_entity_type", default=EntityType.HUMAN)
-_entity_metadata_var: ContextVar[dict] = ContextVar("navibot_entity_metadata", default={})
+# Read-only view: get_entity_metadata() returns it without copying
+_entity_metadata_var: ContextVar[Mapping] = ContextVar("navibot_entity_metadata", default=MappingProxyType({}))
+# FILE_ARTIFACT tag targets found in tool outputs while a collection is active
+_pending_artifacts_var: ContextVar[Optional[dict[str, None]]] = ContextVar("navibot_pending_artifacts", default=None)
+_ARTIFACT_TAG = "[FILE_ARTIFACT:"
+_ARTIFACT_TAG_RE = re.compile(r"\[FILE_ARTIFACT:\s*(.+?)\]")
 
 
 def get_session_id() -> SessionId:
@@ -69,11 +80,18 @@ def resolve_memory_user_id(explicit: Optional[str], session_id: Optional[str], h
 
 
 def get_event_callback() -> Optional[EventCallback]:
-    return _event_callback_var.get()
+    entry = _event_callback_var.get()
+    return entry[0] if entry is not None else None
 
 
 def set_event_callback(callback: Optional[EventCallback]):
-    return _event_callback_var.set(callback)
+    if callback is None:
+        return _event_callback_var.set(None)
+    try:
+        owner = asyncio.get_running_loop()
+    except RuntimeError:
+        owner = None
+    return _event_callback_var.set((callback, owner))
 
 
 def reset_event_callback(token) -> None:
@@ -107,14 +125,14 @@ def reset_entity_type(token) -> None:
     _entity_type_var.reset(token)
 
 
-def get_entity_metadata() -> dict:
-    """Get metadata about the current entity"""
-    return _entity_metadata_var.get().copy()
+def get_entity_metadata() -> Mapping:
+    """Get metadata about the current entity (read-only view)"""
+    return _entity_metadata_var.get()
 
 
 def set_entity_metadata(metadata: dict) -> None:
     """Set metadata for the current entity"""
-    _entity_metadata_var.set(metadata or {})
+    _entity_metadata_var.set(MappingProxyType(dict(metadata or {})))
 
 
 def reset_entity_metadata(token) -> None:
@@ -132,24 +150,74 @@ def is_human_entity() -> bool:
     return get_entity_type() == EntityType.HUMAN
 
 
-def emit_event(event_type: str, data: dict) -> None:
-    try:
-        from app.core.artifact_events import publish
+def start_artifact_collection():
+    """Starts recording the FILE_ARTIFACT tags that tools return in this context."""
+    return _pending_artifacts_var.set({})
 
-        if event_type == "artifact":
-            publish(get_session_id(), event_type, data)
-    except Exception:
-        pass
 
-    callback = get_event_callback()
-    if not callback:
+def pop_collected_artifacts() -> list[str]:
+    """Returns the tag targets recorded so far (in output order) and clears them."""
+    pending = _pending_artifacts_var.get()
+    if not pending:
+        return []
+    paths = list(pending)
+    pending.clear()
+    return paths
+
+
+def reset_artifact_collection(token) -> None:
+    _pending_artifacts_var.reset(token)
+
+
+def note_tool_output(result) -> None:
+    """Records the FILE_ARTIFACT tags in a tool result, if a collection is active."""
+    pending = _pending_artifacts_var.get()
+    if pending is None or not isinstance(result, str) or _ARTIFACT_TAG not in result:
+        return
+    for target in _ARTIFACT_TAG_RE.findall(result):
+        pending[target] = None
+
+
+def emit_event(event_type: str, data: dict) -> None:
+    if event_type == "artifact":
+        try:
+            _publish_artifact(_session_id_var.get(), event_type, data)
+        except Exception:
+            pass
+
+    entry = _event_callback_var.get()
+    if entry is None:
         return
+    callback, owner = entry
     payload = data
     try:
         loop = asyncio.get_running_loop()
-        loop.create_task(callback(event_type, payload))
     except RuntimeError:
-        try:
-            asyncio.run(callback(event_type, payload))
-        except Exception:
-            return
+        loop = None
+    if loop is not None:
+        loop.create_task(callback(event_type, payload))
+        return
+
+    # No loop in this thread (sync tool in a worker): deliver on the callback's
+    # owner loop, or on the background loop if that one is no longer running.
+    if owner is None or owner.is_closed() or not owner.is_running():
+        owner = _get_background_loop()
+    try:
+        asyncio.run_coroutine_threadsafe(callback(event_type, payload), owner)
+    except Exception:
+        return
+
+
+_bg_loop: Optional[asyncio.AbstractEventLoop] = None
+_bg_loop_lock = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """Event loop running forever in a daemon thread, created on first use."""
+    global _bg_loop
+    with _bg_loop_lock:
+        if _bg_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="navibot-events", daemon=True).start()
+            _bg_loop = loop
+    return _bg_loop
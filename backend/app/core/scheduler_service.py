@@ -1,6 +1,7 @@
 import asyncio
-import json
+import atexit
 import os
+import threading
 import time
 import traceback
 import uuid
@@ -10,6 +11,7 @@ from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
+import orjson
 
 # We will import NaviBot lazily or inside the function to avoid circular imports if possible,
 # but since agent.py imports skills inside __init__, top level import might be safe.
@@ -17,34 +19,165 @@ from apscheduler.triggers.cron import CronTrigger
 
 scheduler = None
 
+_LOGS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "app/settings/scheduler_logs.jsonl",
+)
+
 def _get_logs_path():
-    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    return os.path.join(root, "app/settings/scheduler_logs.jsonl")
+    return _LOGS_PATH
+
+def _encode_log(entry: dict) -> bytes:
+    return orjson.dumps(entry, default=str) + b"\n"
+
+# Append handle opened once; APScheduler may write from several threads
+_log_fh = None
+_log_fh_path = None
+_log_lock = threading.Lock()
 
 def _append_log(entry: dict):
+    global _log_fh, _log_fh_path
+    line = _encode_log(entry)
     path = _get_logs_path()
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    with _log_lock:
+        if _log_fh is None or _log_fh_path != path:
+            if _log_fh is not None:
+                _log_fh.close()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _log_fh = open(path, "ab", buffering=1 << 16)
+            _log_fh_path = path
+        try:
+            key_before = _stat_key(path)
+        except OSError:
+            key_before = None
+        _log_fh.write(line)
+        # Flush per entry: list_logs/list_jobs read the file directly
+        _log_fh.flush()
+        _note_appended(path, key_before, entry)
+
+def _close_log():
+    global _log_fh, _log_fh_path
+    with _log_lock:
+        if _log_fh is not None:
+            _log_fh.close()
+            _log_fh = None
+            _log_fh_path = None
+
+atexit.register(_close_log)
+
+# Parsed log entries, valid while the file's (path, mtime_ns, size) is unchanged
+_logs_cache_lock = threading.Lock()
+_logs_cache: dict = {"key": None, "logs": [], "last_run": {}}
+# Initial window read from the end of the file in list_logs
+_TAIL_WINDOW = 256 * 1024
+
+def _stat_key(path: str) -> tuple:
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+def _last_runs_of(logs: list[dict]) -> dict:
+    last_run_by_job = {}
+    for log in logs:
+        job_id = log.get("job_id")
+        finished_at = log.get("finished_at")
+        if not job_id or not finished_at:
+            continue
+        last_run_by_job[job_id] = finished_at
+    return last_run_by_job
+
+def _note_appended(path: str, key_before, entry: dict):
+    """Extends a cache that was current before our write instead of re-parsing."""
+    try:
+        key_after = _stat_key(path)
+    except OSError:
+        return
+    with _logs_cache_lock:
+        if key_before is None or _logs_cache["key"] != key_before:
+            return
+        _logs_cache["logs"].append(entry)
+        if entry.get("job_id") and entry.get("finished_at"):
+            _logs_cache["last_run"][entry["job_id"]] = entry["finished_at"]
+        _logs_cache["key"] = key_after
 
 def _read_logs() -> list[dict]:
+    """Parsed log entries (shared; callers must not mutate them)."""
     path = _get_logs_path()
-    if not os.path.exists(path):
+    try:
+        key = _stat_key(path)
+    except FileNotFoundError:
         return []
+    with _logs_cache_lock:
+        if _logs_cache["key"] == key:
+            return _logs_cache["logs"]
     logs = []
-    with open(path, "r", encoding="utf-8") as f:
+    with open(path, "rb") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
             try:
-                obj = json.loads(line)
+                obj = orjson.loads(line)
                 if isinstance(obj, dict):
                     logs.append(obj)
             except Exception:
                 continue
+    last_run = _last_runs_of(logs)
+    with _logs_cache_lock:
+        _logs_cache.update(key=key, logs=logs, last_run=last_run)
     return logs
 
+def _cached_logs() -> list[dict] | None:
+    """The cached entries if they still match the file on disk, else None."""
+    try:
+        key = _stat_key(_get_logs_path())
+    except FileNotFoundError:
+        return []
+    with _logs_cache_lock:
+        return _logs_cache["logs"] if _logs_cache["key"] == key else None
+
+def _tail_logs(limit: int, job_id: str | None = None) -> list[dict]:
+    """
+    Last `limit` entries (optionally of one job), oldest first, parsing only a
+    trailing window of the file that doubles until enough lines are found.
+    """
+    try:
+        f = open(_get_logs_path(), "rb")
+    except FileNotFoundError:
+        return []
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        window = _TAIL_WINDOW
+        while True:
+            start = max(0, size - window)
+            f.seek(start)
+            lines = f.read(size - start).split(b"\n")
+            if start > 0:
+                # The first fragment may be a line cut in half
+                lines = lines[1:]
+            matched = []
+            for line in reversed(lines):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    obj = orjson.loads(line)
+                except Exception:
+                    continue
+                if isinstance(obj, dict) and (not job_id or obj.get("job_id") == job_id):
+                    matched.append(obj)
+                    if len(matched) >= limit:
+                        break
+            if len(matched) >= limit or start == 0:
+                matched.reverse()
+                return matched
+            window *= 2
+
+def _last_run_by_job() -> dict:
+    """job_id -> finished_at of its latest logged run."""
+    _read_logs()  # refreshes the cache if the file changed
+    with _logs_cache_lock:
+        return _logs_cache["last_run"]
+
 def _truncate_text(value: str, limit: int = 800) -> str:
     if value is None:
         return ""
@@ -315,14 +448,7 @@ def _serialize_trigger(trigger):
 
 def list_jobs():
     sched = get_scheduler()
-    logs = _read_logs()
-    last_run_by_job = {}
-    for log in logs:
-        job_id = log.get("job_id")
-        finished_at = log.get("finished_at")
-        if not job_id or not finished_at:
-            continue
-        last_run_by_job[job_id] = finished_at
+    last_run_by_job = _last_run_by_job()
     jobs = []
     for job in sched.get_jobs():
         trigger_data = _serialize_trigger(job.trigger)
@@ -350,12 +476,7 @@ def get_job(job_id: str):
     job = sched.get_job(job_id)
     if not job:
         return None
-    logs = _read_logs()
-    last_run_time = None
-    for log in reversed(logs):
-        if log.get("job_id") == job_id:
-            last_run_time = log.get("finished_at")
-            break
+    last_run_time = _last_run_by_job().get(job_id)
     trigger_data = _serialize_trigger(job.trigger)
     args = list(job.args) if job.args else []
     prompt = args[0] if len(args) > 0 else ""
@@ -376,7 +497,12 @@ def get_job(job_id: str):
     }
 
 def list_logs(job_id: str | None = None, limit: int = 200):
-    logs = _read_logs()
+    logs = _cached_logs()
+    if logs is None and limit > 0:
+        # No current cache: parse only the tail of the file
+        return _tail_logs(limit, job_id)
+    if logs is None:
+        logs = _read_logs()
     if job_id:
         logs = [log for log in logs if log.get("job_id") == job_id]
     return logs[-limit:]
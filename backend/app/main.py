@@ -16,10 +16,11 @@ from app.api.scheduler import router as scheduler_router
 from app.api.cache import router as cache_router
 from app.channels.manager import channel_manager
 from app.core.bot_pool import bot_pool
+from app.core.mcp_client import close_test_sessions
 from app.core.config_manager import get_settings
 from app.core.model_orchestrator import ModelOrchestrator
 from app.core.persistence import load_chat_history
-from app.core.persistence import init_db, save_chat_message
+from app.core.persistence import init_db, save_chat_message, shutdown_persistence
 from app.skills.scheduler import start_scheduler
 import asyncio
 import logging
@@ -45,9 +46,11 @@ async def lifespan(app: FastAPI):
     # Shutdown
     await channel_manager.stop_all()
     await bot_pool.close_all()
+    await close_test_sessions()
     # Clean up memory system
     from app.core.memory_manager import cleanup_memory
     cleanup_memory()
+    shutdown_persistence()
 
 app = FastAPI(title="NaviBot API", version="0.1.0", lifespan=lifespan)
 
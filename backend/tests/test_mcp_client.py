@@ -0,0 +1,166 @@
+import asyncio
+import contextlib
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import app.core.mcp_client as mcp_client
+from app.core.mcp_client import McpManager
+
+
+class FakeConnectManager(McpManager):
+    """connect_server records attempts; every server except "broken" connects."""
+
+    def __init__(self):
+        super().__init__()
+        self.attempts = []
+
+    async def connect_server(self, server_id, settings, registry, timeout=None):
+        self.attempts.append(server_id)
+        if server_id != "broken":
+            self.active_sessions[server_id] = object()
+
+
+CONFIG = {"servers": {"ok": {"enabled": True}, "broken": {"enabled": True}, "off": {"enabled": False}}}
+
+
+class TestSyncServers(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        patcher_config = mock.patch.object(mcp_client, "get_active_config_runtime", return_value=CONFIG)
+        patcher_registry = mock.patch.object(mcp_client, "get_registry_merged", return_value={})
+        patcher_config.start()
+        patcher_registry.start()
+        self.addCleanup(patcher_config.stop)
+        self.addCleanup(patcher_registry.stop)
+
+        self.manager = FakeConnectManager()
+        self.attempts = self.manager.attempts
+
+    async def test_failed_server_is_retried_on_every_sync(self):
+        for _ in range(3):
+            await self.manager.sync_servers()
+        self.assertEqual(self.attempts.count("broken"), 3)
+        self.assertEqual(self.attempts.count("ok"), 1)
+        self.assertNotIn("off", self.attempts)
+
+    async def test_unchanged_and_healthy_config_skips_work(self):
+        self.manager.active_sessions.update(ok=object(), broken=object())
+        self.manager._last_sync_hash = mcp_client._config_hash(CONFIG, {})
+        await self.manager.sync_servers()
+        self.assertEqual(self.attempts, [])
+
+    async def test_dead_server_is_restarted(self):
+        await self.manager.sync_servers()
+        self.manager.active_sessions.pop("ok")
+        await self.manager.sync_servers()
+        self.assertEqual(self.attempts.count("ok"), 2)
+
+
+class FakeStdio:
+    """Stands in for stdio_client/ClientSession; counts spawned and closed processes."""
+
+    def __init__(self):
+        self.spawned = 0
+        self.closed = 0
+        self.failing = False  # list_tools raises while True
+        self.hanging = False  # initialize never returns while True
+
+    @contextlib.asynccontextmanager
+    async def client(self, params):
+        self.spawned += 1
+        try:
+            yield (self, None)
+        finally:
+            self.closed += 1
+
+    def session(self, read, write):
+        stdio = read
+
+        class FakeSession:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def initialize(self):
+                if stdio.hanging:
+                    await asyncio.Event().wait()
+
+            async def list_tools(self):
+                if stdio.failing:
+                    raise RuntimeError("list_tools failed")
+                return SimpleNamespace(tools=["a", "b"])
+
+        return FakeSession()
+
+
+class TestConnectionPool(unittest.IsolatedAsyncioTestCase):
+    REGISTRY = {"srv": {"command": "fake-mcp", "args": []}}
+
+    async def asyncSetUp(self):
+        self.stdio = FakeStdio()
+        for name, value in (("stdio_client", self.stdio.client), ("ClientSession", self.stdio.session)):
+            patcher = mock.patch.object(mcp_client, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        await mcp_client.close_test_sessions()
+
+    async def _test(self):
+        return await McpManager().test_connection("srv", {}, self.REGISTRY)
+
+    async def test_repeated_tests_reuse_one_process(self):
+        self.assertTrue((await self._test())["success"])
+        self.assertTrue((await self._test())["success"])
+        self.assertEqual(self.stdio.spawned, 1)
+
+    async def test_fresh_session_failure_is_not_retried(self):
+        self.stdio.failing = True
+        result = await self._test()
+        self.assertFalse(result["success"])
+        self.assertEqual(self.stdio.spawned, 1)
+        self.assertEqual(mcp_client._TEST_POOL, {})
+
+    async def test_dead_pooled_session_is_retried_once(self):
+        await self._test()
+        self.stdio.failing = True
+        result = await self._test()
+        self.assertFalse(result["success"])
+        self.assertEqual(self.stdio.spawned, 2)
+
+    async def test_close_test_sessions_drains_pool(self):
+        await self._test()
+        self.assertEqual(len(mcp_client._TEST_POOL_TASKS), 1)
+        await mcp_client.close_test_sessions()
+        self.assertEqual(mcp_client._TEST_POOL, {})
+        self.assertEqual(mcp_client._TEST_POOL_TASKS, set())
+        self.assertEqual(self.stdio.closed, self.stdio.spawned)
+
+
+class TestConnectTimeout(unittest.IsolatedAsyncioTestCase):
+    REGISTRY = {"slow": {"command": "fake-mcp", "args": []}}
+
+    async def asyncSetUp(self):
+        self.stdio = FakeStdio()
+        for name, value in (("stdio_client", self.stdio.client), ("ClientSession", self.stdio.session)):
+            patcher = mock.patch.object(mcp_client, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.manager = McpManager()
+
+    async def test_timed_out_attempt_is_torn_down(self):
+        self.stdio.hanging = True
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.manager.connect_server("slow", {}, self.REGISTRY, timeout=0.05)
+        self.assertEqual(self.manager._server_tasks, {})
+        self.assertEqual(self.manager._stop_futures, {})
+        self.assertEqual(self.stdio.closed, self.stdio.spawned)
+
+        self.stdio.hanging = False
+        await self.manager.connect_server("slow", {}, self.REGISTRY, timeout=1)
+        self.assertIn("slow", self.manager.active_sessions)
+        await self.manager.cleanup()
+        self.assertEqual(self.stdio.closed, self.stdio.spawned)
+        self.assertEqual(self.manager.active_sessions, {})
@@ -0,0 +1,48 @@
+import contextvars
+import copy
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import app.core.mcp_config as mcp_config
+
+
+class TestConfigTransaction(unittest.TestCase):
+    def setUp(self):
+        self.store = {mcp_config.CONFIG_KEY: {"servers": {"base": {"enabled": True, "params": {}}}}}
+        missing = os.path.join(tempfile.mkdtemp(), "active_mcp.json")
+        for name, value in (
+            # Like the DB, every read decodes a fresh copy
+            ("get_app_setting", lambda key: copy.deepcopy(self.store.get(key))),
+            ("set_app_setting", self.store.__setitem__),
+            ("_LEGACY_CONFIG_PATH", missing),
+            ("_ACTIVE_CACHE", None),
+            ("_VIEWS_CACHE", None),
+        ):
+            patcher = mock.patch.object(mcp_config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _outside_servers(self):
+        # A fresh context has no transaction open, like another request thread
+        return contextvars.Context().run(mcp_config.get_active_config_runtime)["servers"]
+
+    def test_pending_writes_stay_out_of_the_caches(self):
+        self.assertEqual(set(self._outside_servers()), {"base"})
+        with mcp_config.transaction():
+            mcp_config.upsert_server_config("new", {"enabled": True})
+            self.assertIn("new", mcp_config.get_active_config_runtime()["servers"])
+            self.assertIn("new", mcp_config.get_active_config()["servers"])
+            self.assertEqual(set(self._outside_servers()), {"base"})
+            self.assertNotIn("new", self.store[mcp_config.CONFIG_KEY]["servers"])
+        self.assertEqual(set(self._outside_servers()), {"base", "new"})
+        self.assertEqual(set(mcp_config.get_active_config_runtime()["servers"]), {"base", "new"})
+
+    def test_failed_transaction_writes_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with mcp_config.transaction():
+                mcp_config.upsert_server_config("new", {"enabled": True})
+                raise RuntimeError("boom")
+        self.assertEqual(set(mcp_config.get_active_config_runtime()["servers"]), {"base"})
+        self.assertEqual(set(self.store[mcp_config.CONFIG_KEY]["servers"]), {"base"})
@@ -0,0 +1,70 @@
+import threading
+import unittest
+from unittest import mock
+
+import app.core.memory_manager as memory_manager
+from app.core.memory_manager import AgentMemory
+
+
+class FakeMem0:
+    """Records add() calls; search/get_all return every stored text."""
+
+    def __init__(self):
+        self.adds = []
+        self.lock = threading.Lock()
+
+    def add(self, messages, user_id=None, metadata=None):
+        with self.lock:
+            self.adds.append((user_id, metadata, [m["content"] for m in messages]))
+
+    def _stored(self, user_id):
+        return [{"memory": text} for uid, _, texts in self.adds if uid == user_id for text in texts]
+
+    def search(self, query, user_id=None, limit=3):
+        return {"results": self._stored(user_id)[:limit]}
+
+    def get_all(self, user_id=None):
+        return {"results": self._stored(user_id)}
+
+
+class TestBackgroundWriter(unittest.TestCase):
+    def setUp(self):
+        # Without GOOGLE_API_KEY Mem0 is not loaded; the fake takes its place
+        with mock.patch.dict("os.environ", {"GOOGLE_API_KEY": ""}):
+            self.memory = AgentMemory()
+        self.fake = FakeMem0()
+        self.memory.memory = self.fake
+        self.memory._closed = False
+        self.addCleanup(self.memory.close)
+
+    def test_burst_is_grouped_per_user_and_metadata(self):
+        with mock.patch.object(memory_manager, "_WRITE_BATCH_WINDOW", 1.0):
+            self.memory.add_interaction("u1", "a")
+            self.memory.add_interaction("u2", "b")
+            self.memory.add_interaction("u1", "c")
+            self.memory.add_interaction("u1", "d", {"k": 1})
+            self.assertTrue(self.memory.flush(timeout=5))
+        self.assertEqual(
+            sorted(self.fake.adds, key=repr),
+            sorted([("u1", None, ["a", "c"]), ("u2", None, ["b"]), ("u1", {"k": 1}, ["d"])], key=repr),
+        )
+
+    def test_reads_see_queued_writes(self):
+        self.memory.add_interaction("u1", "likes tea")
+        self.assertEqual(self.memory.get_all_user_facts("u1"), ["likes tea"])
+        self.memory.add_interaction("u1", "lives in Madrid")
+        self.assertEqual(self.memory.search_memory("u1", "where", n_results=5), ["likes tea", "lives in Madrid"])
+
+    def test_failed_add_does_not_block_flush(self):
+        self.fake.add = mock.Mock(side_effect=RuntimeError("quota"))
+        self.memory.add_interaction("u1", "a")
+        self.assertTrue(self.memory.flush(timeout=5))
+
+    def test_close_drains_and_stops_the_writer(self):
+        for i in range(5):
+            self.memory.add_interaction("u1", str(i))
+        writer = self.memory._writer
+        self.memory.close()
+        self.assertFalse(writer.is_alive())
+        self.assertEqual([t for _, _, texts in self.fake.adds for t in texts], ["0", "1", "2", "3", "4"])
+        self.assertFalse(self.memory.add_interaction("u1", "late"))
@@ -0,0 +1,31 @@
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import app.core.models as models
+from app.main import app
+
+MODELS = [{"id": f"m{i}", "display_name": f"Model {i}"} for i in range(3)]
+
+
+class TestAvailableModelsLimit(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        patcher = mock.patch.dict("os.environ", {"GOOGLE_API_KEY": "key"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_non_positive_limit_is_empty_with_warm_and_cold_cache(self):
+        with mock.patch.object(models, "_models_cache", ("key", time.monotonic(), MODELS, MODELS)):
+            self.assertEqual(await models.get_available_gemini_models(limit=-1), [])
+            self.assertEqual(await models.get_available_gemini_models(limit=2), MODELS[:2])
+        with mock.patch.object(models, "_models_cache", None), mock.patch.object(models, "_get_client") as client:
+            self.assertEqual(await models.get_available_gemini_models(limit=-1), [])
+            client.assert_not_called()
+
+
+class TestAvailableModelsApi(unittest.TestCase):
+    def test_limit_must_be_positive(self):
+        response = TestClient(app).get("/api/available-models", params={"limit": -1})
+        self.assertEqual(response.status_code, 422)
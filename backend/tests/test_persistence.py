@@ -1,8 +1,14 @@
 import importlib
 import os
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
+from unittest import mock
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
 
 from app.core.runtime_context import reset_session_id, set_session_id
 
@@ -66,6 +72,156 @@ class TestPersistence(unittest.TestCase):
         self.assertEqual(history[1]["role"], "model")
         self.assertEqual(history[1]["parts"][0]["text"], "hi")
 
+    def test_page_items_own_their_raw_payload(self):
+        p = self.persistence
+        p.save_chat_message("s3", "model", {"role": "model", "parts": [{"text": "hi"}]})
+        first = p.load_chat_messages_page("s3")["items"][0]
+        first["raw"]["parts"].append({"text": "mutated"})
+        second = p.load_chat_messages_page("s3")["items"][0]
+        self.assertEqual(second["raw"]["parts"], [{"text": "hi"}])
+        self.assertEqual(second["content"], "hi")
+
+    def test_init_db_adds_indexes_to_existing_tables(self):
+        p = self.persistence
+        engine = p.get_engine()
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_sessions_updated"))
+        p.init_db()
+        names = {index["name"] for index in inspect(engine).get_indexes("sessions")}
+        self.assertIn("ix_sessions_updated", names)
+
+    def test_reused_row_id_shows_the_new_content(self):
+        p = self.persistence
+        p.save_chat_message("s1", "user", "yes")
+        old = p.load_chat_messages_page("s1")["items"][0]
+        with p.db_session() as db:
+            db.query(p.ChatMessage).filter(p.ChatMessage.session_id == "s1").delete()
+        p.save_chat_message("s2", "user", "nop")
+        new = p.load_chat_messages_page("s2")["items"][0]
+        # SQLite hands out the deleted row id again
+        self.assertEqual(new["id"], old["id"])
+        self.assertEqual(new["content"], "nop")
+
+
+class TestWriteBehind(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmp.name) / "test.db"
+        os.environ["NAVIBOT_DB_URL"] = f"sqlite:///{db_path}"
+        import app.core.persistence as persistence
+        importlib.reload(persistence)
+        persistence.init_db()
+        self.persistence = persistence
+        self.failures_left = 0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _no_writer(self):
+        # An unstarted thread takes the writer's slot, so the test decides when to flush
+        self.persistence._flusher = threading.Thread(target=lambda: None)
+
+    def _locked_commits(self, times):
+        """The next `times` sessions fail on commit like a locked SQLite file."""
+        self.failures_left = times
+        real = self.persistence._get_session
+
+        def factory():
+            session = real()
+            if self.failures_left:
+                self.failures_left -= 1
+
+                def commit():
+                    raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+                session.commit = commit
+            return session
+
+        return mock.patch.object(self.persistence, "_get_session", factory)
+
+    def _stored_messages(self):
+        p = self.persistence
+        with p.db_session() as db:
+            return [row.content for row in db.query(p.ChatMessage).order_by(p.ChatMessage.id)]
+
+    def test_read_after_write(self):
+        p = self.persistence
+        for i in range(10):
+            p.save_chat_message("s1", "user", f"m{i}")
+        self.assertEqual(self._stored_messages(), [f"m{i}" for i in range(10)])
+
+    def test_failed_flush_keeps_the_batch(self):
+        p = self.persistence
+        self._no_writer()
+        p.save_chat_message("s1", "user", "a")
+        p.save_chat_message("s1", "user", "b")
+        with self._locked_commits(1):
+            with self.assertRaises(OperationalError):
+                p.flush_pending_writes()
+        self.assertEqual(len(p._pending_writes), 2)
+        p.save_chat_message("s1", "user", "c")
+        self.assertEqual(self._stored_messages(), ["a", "b", "c"])
+
+    def test_persistent_failure_is_reported_to_callers(self):
+        p = self.persistence
+        with mock.patch.multiple(p, _WRITE_MAX_RETRIES=2, _WRITE_RETRY_BASE=0.01):
+            with self._locked_commits(1000):
+                p.save_chat_message("s1", "user", "a")
+                deadline = time.monotonic() + 5
+                while p._write_error is None and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertIsInstance(p._write_error, OperationalError)
+                with self.assertRaises(OperationalError):
+                    p.save_chat_message("s1", "user", "b")
+            p.save_chat_message("s1", "user", "c")
+        self.assertIsNone(p._write_error)
+        self.assertEqual(self._stored_messages(), ["a", "b", "c"])
+
+    def test_bad_row_is_dropped_without_blocking_the_rest(self):
+        p = self.persistence
+        self._no_writer()
+        p.save_chat_message("s1", "user", "a")
+        # NOT NULL violation: fails on every attempt, unlike a locked database
+        p._enqueue_write(p.ChatMessage, {"session_id": "s1", "role": "user", "content": None, "created_at": p._utcnow()})
+        p.save_chat_message("s2", "user", "b")
+        with self.assertLogs(p.logger, "ERROR"):
+            p.flush_pending_writes()
+        self.assertEqual(p._pending_writes, [])
+        self.assertIsNone(p._write_error)
+        p.save_chat_message("s1", "user", "c")
+        self.assertEqual(self._stored_messages(), ["a", "b", "c"])
+
+    def test_lock_during_row_by_row_retry_requeues_the_rest(self):
+        p = self.persistence
+        self._no_writer()
+        p.save_chat_message("s1", "user", "a")
+        p._enqueue_write(p.ChatMessage, {"session_id": "s1", "role": "user", "content": None, "created_at": p._utcnow()})
+        p.save_chat_message("s1", "user", "b")
+        real = p._insert_rows
+        calls = []
+
+        def insert_rows(rows):
+            calls.append(len(rows))
+            # Batch fails on the bad row; the lock hits on the third single-row insert
+            if len(calls) == 4:
+                raise OperationalError("INSERT", {}, Exception("database is locked"))
+            return real(rows)
+
+        with mock.patch.object(p, "_insert_rows", insert_rows), self.assertLogs(p.logger, "ERROR"):
+            with self.assertRaises(OperationalError):
+                p.flush_pending_writes()
+        self.assertEqual([row["content"] for _, row in p._pending_writes], ["b"])
+        p.flush_pending_writes()
+        self.assertEqual(self._stored_messages(), ["a", "b"])
+
+    def test_exit_drain_retries_buffered_writes(self):
+        p = self.persistence
+        self._no_writer()
+        p.save_chat_message("s1", "user", "a")
+        with mock.patch.object(p, "_WRITE_RETRY_BASE", 0.01), self._locked_commits(2):
+            p._drain_pending_writes()
+        self.assertEqual(p._pending_writes, [])
+        self.assertEqual(self._stored_messages(), ["a"])
 
 
 class TestAgentRecovery(unittest.IsolatedAsyncioTestCase):
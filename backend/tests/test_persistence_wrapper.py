@@ -0,0 +1,66 @@
+import inspect
+import unittest
+
+from app.core.persistence_wrapper import _make_binder
+
+
+def _reference(func, args, kwargs):
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+def with_defaults(query, limit=10, exact=False):
+    pass
+
+
+def with_keyword_only(path, *, encoding="utf-8", create):
+    pass
+
+
+def with_varargs(first, *rest, flag=True, **extra):
+    pass
+
+
+class TestMakeBinder(unittest.TestCase):
+    CASES = [
+        (with_defaults, ("q",), {}),
+        (with_defaults, ("q", 5), {}),
+        (with_defaults, (), {"query": "q", "exact": True}),
+        (with_defaults, ("q",), {"exact": True, "limit": 3}),
+        (with_keyword_only, ("a.txt",), {"create": True}),
+        (with_keyword_only, (), {"path": "a.txt", "create": False, "encoding": "latin-1"}),
+        (with_varargs, (1, 2, 3), {"flag": False, "x": 1}),
+        (with_varargs, (1,), {}),
+    ]
+
+    ERRORS = [
+        # Duplicate argument (positional and by name)
+        (with_defaults, ("q",), {"query": "q"}),
+        (with_defaults, ("q", 1), {"limit": 2}),
+        # Missing required, extra positional, or unknown name
+        (with_defaults, (), {}),
+        (with_defaults, ("q", 1, True, "extra"), {}),
+        (with_defaults, ("q",), {"unknown": 1}),
+        (with_keyword_only, ("a.txt",), {}),
+        (with_keyword_only, ("a.txt", True), {}),
+    ]
+
+    def test_matches_signature_bind(self):
+        for func, args, kwargs in self.CASES:
+            with self.subTest(func=func.__name__, args=args, kwargs=kwargs):
+                self.assertEqual(_make_binder(func)(args, kwargs), _reference(func, args, kwargs))
+
+    def test_raises_like_signature_bind(self):
+        for func, args, kwargs in self.ERRORS:
+            with self.subTest(func=func.__name__, args=args, kwargs=kwargs):
+                with self.assertRaises(TypeError):
+                    _reference(func, args, kwargs)
+                with self.assertRaises(TypeError):
+                    _make_binder(func)(args, kwargs)
+
+    def test_binder_does_not_share_state_between_calls(self):
+        bind = _make_binder(with_defaults)
+        first = bind(("q",), {})
+        first["limit"] = 99
+        self.assertEqual(bind(("q",), {})["limit"], 10)
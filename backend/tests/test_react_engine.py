@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+
+from app.core.react_engine import ReActLoop
+from app.core.runtime_context import emit_event, note_tool_output
+
+
+class FakeAgent:
+    def __init__(self, text="ok"):
+        self.text = text
+
+    async def ensure_session(self, session_id: str):
+        pass
+
+    async def send_message(self, message: str, session_id: str = "default"):
+        class Response:
+            text = self.text
+
+        return Response()
+
+
+class SlowAgent(FakeAgent):
+    async def send_message(self, message: str, session_id: str = "default"):
+        await asyncio.sleep(0.05)
+        self.finished = True
+        return await super().send_message(message, session_id)
+
+
+class ArtifactAgent(FakeAgent):
+    """Its tools return two FILE_ARTIFACT tags; the reply cites only the first one."""
+
+    async def send_message(self, message: str, session_id: str = "default"):
+        note_tool_output("Saved. [FILE_ARTIFACT: /files/a.txt]")
+        note_tool_output("Saved. [FILE_ARTIFACT: /files/b.csv]")
+        # Plain artifact events (filesystem writes) do not add tags to the reply
+        emit_event("artifact", {"op": "write", "path": "c.md"})
+        self.text = "Listo: [FILE_ARTIFACT: /files/a.txt]"
+        return await super().send_message(message, session_id)
+
+
+class TestReActExecute(unittest.IsolatedAsyncioTestCase):
+    async def test_uncited_artifacts_are_appended(self):
+        result = await ReActLoop(ArtifactAgent(), "s1").execute("hola")
+        self.assertEqual(result["response"], "Listo: [FILE_ARTIFACT: /files/a.txt]\n\n[FILE_ARTIFACT: /files/b.csv]")
+
+    async def test_artifacts_do_not_leak_into_the_next_execution(self):
+        await ReActLoop(ArtifactAgent(), "s1").execute("hola")
+        result = await ReActLoop(FakeAgent(), "s1").execute("otra")
+        self.assertEqual(result["response"], "ok")
+
+    async def test_model_call_is_not_cancelled_by_timeout(self):
+        agent = SlowAgent()
+        result = await ReActLoop(agent, "s1", timeout_seconds=0.01).execute("hola")
+        self.assertTrue(agent.finished)
+        self.assertEqual(result["termination_reason"], "natural_completion")
+        self.assertEqual(result["response"], "ok")
+
+
+class TestReActEvents(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_callback_events_are_all_delivered_in_order(self):
+        received = []
+
+        async def cb(event_type, data):
+            await asyncio.sleep(0.01)
+            received.append(event_type)
+
+        result = await ReActLoop(FakeAgent(), "s1", event_callback=cb).execute("hola")
+        self.assertEqual(result["termination_reason"], "natural_completion")
+        self.assertEqual(received[0], "start")
+        self.assertEqual(received[-1], "completion")
+        self.assertIn("response", received)
+
+    async def test_iteration_events_keep_their_own_types(self):
+        received = []
+
+        async def cb(event_type, data):
+            received.append(event_type)
+
+        await ReActLoop(FakeAgent(), "s1", event_callback=cb).execute("hola")
+        self.assertNotIn("iteration_events", received)
+        start = received.index("iteration_start")
+        self.assertEqual(received[start + 1], "thinking")
+
+    async def test_without_callback_nothing_is_scheduled(self):
+        loop = ReActLoop(FakeAgent(), "s1")
+        result = await loop.execute("hola")
+        self.assertEqual(result["response"], "ok")
+        self.assertEqual(loop._pending_events, set())
+
+    @unittest.skipUnless(hasattr(asyncio, "eager_task_factory"), "eager tasks need Python 3.12+")
+    async def test_non_suspending_callback_runs_eagerly(self):
+        received = []
+
+        async def cb(event_type, data):
+            received.append(event_type)
+
+        loop = ReActLoop(FakeAgent(), "s1", event_callback=cb)
+        loop._emit_event("ping", {})
+        self.assertEqual(received, ["ping"])
+        self.assertEqual(loop._pending_events, set())
@@ -0,0 +1,60 @@
+import asyncio
+import unittest
+
+from app.core.persistence_wrapper import wrap_tool
+from app.core.runtime_context import (
+    emit_event,
+    note_tool_output,
+    pop_collected_artifacts,
+    reset_artifact_collection,
+    start_artifact_collection,
+)
+
+
+def screenshot(name: str) -> str:
+    return f"Screenshot saved. [FILE_ARTIFACT: /files/{name}]"
+
+
+class TestArtifactCollection(unittest.TestCase):
+    def setUp(self):
+        token = start_artifact_collection()
+        self.addCleanup(reset_artifact_collection, token)
+
+    def test_tags_from_tool_outputs_in_order_without_duplicates(self):
+        note_tool_output("[FILE_ARTIFACT: /files/b.txt] and [FILE_ARTIFACT: /files/a.png]")
+        note_tool_output("again [FILE_ARTIFACT: /files/b.txt]")
+        self.assertEqual(pop_collected_artifacts(), ["/files/b.txt", "/files/a.png"])
+        self.assertEqual(pop_collected_artifacts(), [])
+
+    def test_untagged_outputs_and_artifact_events_are_not_collected(self):
+        note_tool_output({"saved": {"path": "report.pdf"}})
+        note_tool_output("plain text")
+        emit_event("artifact", {"op": "write", "path": "notes.md"})
+        self.assertEqual(pop_collected_artifacts(), [])
+
+    def test_wrapped_tool_output_is_collected(self):
+        self.assertEqual(wrap_tool(screenshot)("sc1.png"), "Screenshot saved. [FILE_ARTIFACT: /files/sc1.png]")
+        self.assertEqual(pop_collected_artifacts(), ["/files/sc1.png"])
+
+    def test_nested_collection_is_isolated(self):
+        note_tool_output("[FILE_ARTIFACT: /files/outer.txt]")
+        token = start_artifact_collection()
+        note_tool_output("[FILE_ARTIFACT: /files/inner.txt]")
+        self.assertEqual(pop_collected_artifacts(), ["/files/inner.txt"])
+        reset_artifact_collection(token)
+        self.assertEqual(pop_collected_artifacts(), ["/files/outer.txt"])
+
+
+class TestArtifactCollectionAcrossThreads(unittest.IsolatedAsyncioTestCase):
+    async def test_sync_tool_in_worker_thread_is_collected(self):
+        token = start_artifact_collection()
+        try:
+            # Sync tools run through to_thread with a copy of the context
+            await asyncio.to_thread(wrap_tool(screenshot), "report.png")
+            self.assertEqual(pop_collected_artifacts(), ["/files/report.png"])
+        finally:
+            reset_artifact_collection(token)
+
+    async def test_nothing_collected_outside_a_collection(self):
+        note_tool_output("[FILE_ARTIFACT: /files/stray.txt]")
+        self.assertEqual(pop_collected_artifacts(), [])
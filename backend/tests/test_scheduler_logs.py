@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import orjson
+
+import app.core.scheduler_service as scheduler_service
+
+
+class TestTailLogs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "scheduler_logs.jsonl")
+        # Tiny window: forces doubling and lines cut in half
+        for name, value in (("_get_logs_path", lambda: self.path), ("_TAIL_WINDOW", 64)):
+            patcher = mock.patch.object(scheduler_service, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _write(self, entries, raw_lines=()):
+        with open(self.path, "wb") as f:
+            for entry in entries:
+                f.write(orjson.dumps(entry) + b"\n")
+            for line in raw_lines:
+                f.write(line + b"\n")
+
+    def test_missing_file(self):
+        self.assertEqual(scheduler_service._tail_logs(10), [])
+
+    def test_last_entries_oldest_first(self):
+        entries = [{"job_id": f"job{i % 3}", "n": i} for i in range(50)]
+        self._write(entries)
+        self.assertEqual(scheduler_service._tail_logs(5), entries[-5:])
+        self.assertEqual(scheduler_service._tail_logs(500), entries)
+
+    def test_job_filter_widens_the_window(self):
+        entries = [{"job_id": "rare", "n": 0}] + [{"job_id": "busy", "n": i} for i in range(1, 200)]
+        self._write(entries)
+        self.assertEqual(scheduler_service._tail_logs(10, "rare"), [{"job_id": "rare", "n": 0}])
+        self.assertEqual(scheduler_service._tail_logs(2, "busy"), entries[-2:])
+
+    def test_skips_blank_and_malformed_lines(self):
+        self._write([{"job_id": "a", "n": 1}], raw_lines=[b"", b"{not json", b"[1, 2]"])
+        self.assertEqual(scheduler_service._tail_logs(10), [{"job_id": "a", "n": 1}])
+
+    def test_matches_full_read(self):
+        entries = [{"job_id": f"job{i % 4}", "finished_at": str(i)} for i in range(120)]
+        self._write(entries)
+        for job_id in (None, "job1"):
+            with self.subTest(job_id=job_id):
+                full = [e for e in scheduler_service._read_logs() if not job_id or e["job_id"] == job_id]
+                self.assertEqual(scheduler_service._tail_logs(7, job_id), full[-7:])